@@ -0,0 +1,167 @@
+"""
+Latency-learned timeouts for MCP calls.
+Each (server, tool) pair keeps a rolling window of observed durations; its
+timeout is a multiple of the recent p99 (or EWMA, whichever is higher), kept
+between a floor and a ceiling. Until enough samples exist the server-wide
+window is used, then the fixed defaults. State is persisted to a JSON file so
+restarts keep what was learned.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .latency import LatencyWindow
+
+ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "1") == "1"
+TIMEOUT_FLOOR = float(os.getenv("TIMEOUT_FLOOR", "2"))
+TIMEOUT_CEILING = float(os.getenv("TIMEOUT_CEILING", "90"))
+TIMEOUT_MULTIPLIER = float(os.getenv("TIMEOUT_MULTIPLIER", "3"))
+TIMEOUT_MIN_SAMPLES = int(os.getenv("TIMEOUT_MIN_SAMPLES", "10"))
+# (server, tool) windows kept; the least recently used are dropped beyond this
+TIMEOUT_MAX_WINDOWS = int(os.getenv("TIMEOUT_MAX_WINDOWS", "512"))
+# Learned state; empty disables persistence
+TIMEOUT_STATE_FILE = os.getenv("TIMEOUT_STATE_FILE", "adaptive-timeouts.json")
+SAVE_EVERY = 25
+STATE_VERSION = 1
+
+# Timeouts used before anything is learned (the previous fixed values)
+DEFAULT_TIMEOUTS = {"list_tools": 30.0, "call_tool": 60.0}
+SERVER_WIDE = "*"
+
+_windows = OrderedDict()
+_lock = threading.Lock()
+_records = 0
+
+
+def _window(server: str, tool: str, create: bool = False):
+    """Window of (server, tool); created only when recording, so lookups never grow the state."""
+    key = f"{server}|{tool}"
+    with _lock:
+        window = _windows.get(key)
+        if window is None:
+            if not create:
+                return None
+            window = _windows[key] = LatencyWindow()
+            _evict()
+        else:
+            _windows.move_to_end(key)
+        return window
+
+
+def _evict():
+    while len(_windows) > TIMEOUT_MAX_WINDOWS:
+        _windows.popitem(last=False)
+
+
+def _learned(window: LatencyWindow):
+    if window is None or len(window) < TIMEOUT_MIN_SAMPLES:
+        return None
+    return max(window.percentile(0.99), window.ewma or 0) * TIMEOUT_MULTIPLIER
+
+
+def timeout_for(server: str, tool: str, operation: str = "call_tool") -> float:
+    """Timeout in seconds for one call of tool on server."""
+    default = DEFAULT_TIMEOUTS.get(operation, DEFAULT_TIMEOUTS["call_tool"])
+    if not ADAPTIVE_TIMEOUTS:
+        return default
+    learned = _learned(_window(server, tool))
+    if learned is None and tool != operation:
+        learned = _learned(_window(server, SERVER_WIDE))
+    if learned is None:
+        return min(default, TIMEOUT_CEILING)
+    return min(max(learned, TIMEOUT_FLOOR), TIMEOUT_CEILING)
+
+
+def record(server: str, tool: str, seconds: float):
+    """Record a completed call (timed-out calls are recorded with the timeout, a lower bound)."""
+    global _records
+    _window(server, tool, create=True).add(seconds)
+    if tool != "list_tools":
+        _window(server, SERVER_WIDE, create=True).add(seconds)
+    _records += 1
+    if TIMEOUT_STATE_FILE and _records % SAVE_EVERY == 0:
+        save()
+
+
+@contextmanager
+def track(server: str, tool: str, timeout: float):
+    """Time the with-block and record it; errors other than timeouts are not learned from."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        elapsed = time.perf_counter() - start
+        if isinstance(e, TimeoutError) or "timeout" in str(e).lower() or elapsed >= timeout * 0.95:
+            record(server, tool, max(elapsed, timeout))
+        raise
+    record(server, tool, time.perf_counter() - start)
+
+
+def snapshot() -> dict:
+    """Current timeout and latency stats per (server, tool)."""
+    with _lock:
+        items = list(_windows.items())
+    result = {}
+    for key, window in items:
+        server, tool = key.split("|", 1)
+        operation = "list_tools" if tool == "list_tools" else "call_tool"
+        result[key] = {
+            "samples": len(window),
+            "p50": window.percentile(0.5),
+            "p99": window.percentile(0.99),
+            "ewma": window.ewma,
+            "timeout": timeout_for(server, tool, operation),
+        }
+    return result
+
+
+def export_state() -> dict:
+    with _lock:
+        return {"version": STATE_VERSION, "windows": {key: w.to_dict() for key, w in _windows.items()}}
+
+
+def import_state(state: dict) -> int:
+    """Merge saved windows; a window replaces the current one only when it was updated later."""
+    if state.get("version") != STATE_VERSION:
+        return 0
+    loaded = 0
+    with _lock:
+        for key, data in state.get("windows", {}).items():
+            current = _windows.get(key)
+            if current is None or (data.get("updated") or 0) > (current.updated or 0):
+                _windows[key] = LatencyWindow.from_dict(data)
+                loaded += 1
+        _evict()
+    return loaded
+
+
+def save(path: str = None):
+    path = path or TIMEOUT_STATE_FILE
+    if not path:
+        return
+    state = export_state()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[DEBUG] Could not save adaptive timeouts to {path}: {e}")
+
+
+def load(path: str = None):
+    path = path or TIMEOUT_STATE_FILE
+    if not path or not os.path.exists(path):
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[DEBUG] Could not load adaptive timeouts from {path}: {e}")
+        return
+    loaded = import_state(state)
+    print(f"[INFO] Loaded adaptive timeouts for {loaded} server/tool pairs")
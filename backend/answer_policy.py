@@ -0,0 +1,91 @@
+"""
+Answer policies for tool results.
+Decides per server profile (see mcp_instructions.server_kind) how a tool
+result becomes the answer:
+  llm      full final LLM call with the tool result (the previous behaviour)
+  excerpt  short final LLM call with only the top-ranked excerpt of the result
+  direct   the rendered tool result is the answer, no second LLM call
+  lead_in  like direct, after a templated lead-in sentence
+Documentation servers already return clean markdown, so they skip the final
+call. Results that are errors, JSON data, too short, or for a language the
+documents are not written in go back to an LLM call.
+"""
+
+import os
+
+POLICIES = ("llm", "excerpt", "direct", "lead_in")
+
+DEFAULT_ANSWER_POLICIES = {
+    "deepwiki": "lead_in",
+    "cloudflare_docs": "lead_in",
+    "gitmcp_docs": "lead_in",
+}
+# Overrides as profile=policy pairs, e.g. "deepwiki=direct,coingecko=excerpt"
+ANSWER_POLICIES = os.getenv("ANSWER_POLICIES", "")
+# Languages a rendered result can be returned in as is; others get an excerpt call that answers in the user's language
+ANSWER_DIRECT_LANGS = {lang.strip() for lang in os.getenv("ANSWER_DIRECT_LANGS", "en").split(",") if lang.strip()}
+# Shorter results are answered by the LLM, they rarely stand on their own
+ANSWER_MIN_CHARS = int(os.getenv("ANSWER_MIN_CHARS", "200"))
+# Size of the excerpt sent to the short final call, in tokens
+ANSWER_EXCERPT_TOKENS = int(os.getenv("ANSWER_EXCERPT_TOKENS", "600"))
+
+LEAD_INS = {
+    "deepwiki": "Here is what the DeepWiki documentation says about this:",
+    "cloudflare_docs": "Here is what the Cloudflare documentation says about this:",
+    "gitmcp_docs": "Here is what the repository documentation says about this:",
+}
+DEFAULT_LEAD_IN = "Here is what I found:"
+
+
+def _parse_policies(spec: str) -> dict:
+    policies = dict(DEFAULT_ANSWER_POLICIES)
+    for pair in spec.split(","):
+        profile, _, policy = pair.partition("=")
+        profile, policy = profile.strip(), policy.strip()
+        if not profile:
+            continue
+        if policy not in POLICIES:
+            print(f"[DEBUG] Ignoring unknown answer policy {policy!r} for {profile}")
+            continue
+        policies[profile] = policy
+    return policies
+
+
+_policies = _parse_policies(ANSWER_POLICIES)
+
+
+def policy_for(profile: str) -> str:
+    return _policies.get(profile, "llm")
+
+
+def is_error_result(serializable_result) -> bool:
+    if not isinstance(serializable_result, dict):
+        return False
+    return "error" in serializable_result or bool(serializable_result.get("is_error") or serializable_result.get("isError"))
+
+
+def is_renderable(readable_result) -> bool:
+    """Text that reads as an answer on its own: documentation blocks or prose, not JSON data."""
+    if not isinstance(readable_result, str) or len(readable_result.strip()) < ANSWER_MIN_CHARS:
+        return False
+    if "<result>" in readable_result:
+        return True
+    return readable_result.lstrip()[:1] not in ("{", "[")
+
+
+def choose_path(profile: str, lang_code: str, serializable_result, readable_result) -> str:
+    """Path actually taken for this result under the profile's policy."""
+    policy = policy_for(profile)
+    if policy in ("llm", "excerpt"):
+        return policy
+    if is_error_result(serializable_result) or not is_renderable(readable_result):
+        return "llm"
+    if lang_code not in ANSWER_DIRECT_LANGS:
+        return "excerpt"
+    return policy
+
+
+def render_answer(path: str, profile: str, rendered_markdown: str) -> str:
+    if path == "lead_in":
+        return f"{LEAD_INS.get(profile, DEFAULT_LEAD_IN)}\n\n{rendered_markdown}"
+    return rendered_markdown
@@ -0,0 +1,58 @@
+"""
+Benchmark: the codec (orjson when installed, compact output for the LLM)
+against the previous stdlib json calls on tool-result-sized payloads.
+
+Run from the repository root:
+    python -m backend.benchmarks.json_bench
+"""
+
+import json
+import random
+import timeit
+
+from backend import codec
+
+
+def coingecko_markets(count: int) -> list:
+    """Payload shaped like CoinGecko's /coins/markets."""
+    rng = random.Random(0)
+    return [
+        {
+            "id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i} Ünïcode",
+            "image": f"https://assets.coingecko.com/coins/images/{i}/large/coin.png",
+            "current_price": rng.uniform(0.01, 70000), "market_cap": rng.randint(10 ** 6, 10 ** 12),
+            "market_cap_rank": i + 1, "total_volume": rng.randint(10 ** 5, 10 ** 10),
+            "high_24h": rng.uniform(1, 70000), "low_24h": rng.uniform(1, 70000),
+            "price_change_percentage_24h": rng.uniform(-10, 10),
+            "roi": None, "last_updated": "2025-06-01T12:00:00.000Z",
+        }
+        for i in range(count)
+    ]
+
+
+def bench(label: str, old, new, runs: int):
+    old_s = timeit.timeit(old, number=runs) / runs
+    new_s = timeit.timeit(new, number=runs) / runs
+    print(f"{label}: stdlib {old_s * 1000:.2f} ms, codec ({codec.CODEC_NAME}) {new_s * 1000:.2f} ms, {old_s / new_s:.1f}x faster")
+
+
+def main():
+    data = coingecko_markets(250)
+    text = json.dumps(data)
+    assert codec.loads(text) == json.loads(text)
+    runs = 50
+
+    bench("parse tool result (%d KB)" % (len(text) // 1024), lambda: json.loads(text), lambda: codec.loads(text), runs)
+    # Previously pretty-printed for the LLM; now compact
+    bench("serialize for LLM", lambda: json.dumps(data, indent=2, ensure_ascii=False), lambda: codec.for_llm(data), runs)
+    bench("render response", lambda: json.dumps({"response": text}, ensure_ascii=False).encode("utf-8"),
+          lambda: codec.dumps_bytes({"response": text}), runs)
+
+    pretty = json.dumps(data, indent=2, ensure_ascii=False)
+    compact = codec.for_llm(data)
+    print(f"LLM-bound text: pretty {len(pretty)} chars, compact {len(compact)} chars "
+          f"({1 - len(compact) / len(pretty):.0%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
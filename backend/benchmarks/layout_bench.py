@@ -0,0 +1,41 @@
+"""
+Benchmark: keyboard-layout fixing with precompiled str.translate tables
+against the previous per-character dict lookup.
+
+Run from the repository root:
+    python -m backend.benchmarks.layout_bench
+"""
+
+import timeit
+
+from backend.layout_tables import LAYOUTS, fix_keyboard_layout, fix_keyboard_layout_many
+
+
+def fix_keyboard_layout_dict(text: str, from_lang: str, to_lang: str) -> str:
+    """Previous implementation, kept for comparison."""
+    layout = LAYOUTS.get((from_lang, to_lang))
+    if layout:
+        return ''.join(layout.get(c, c) for c in text)
+    return text
+
+
+def main():
+    # "Привет, как дела? Это длинный вставленный текст." typed on an English layout
+    sample = "Ghbdtn? rfr ltkf& 'nj lkbyysq dcnfdktyysq ntrcn/ "
+    long_text = sample * 2000
+    messages = [sample * 4] * 1000
+
+    assert fix_keyboard_layout(long_text, 'en', 'ru') == fix_keyboard_layout_dict(long_text, 'en', 'ru')
+
+    runs = 20
+    old = timeit.timeit(lambda: fix_keyboard_layout_dict(long_text, 'en', 'ru'), number=runs) / runs
+    new = timeit.timeit(lambda: fix_keyboard_layout(long_text, 'en', 'ru'), number=runs) / runs
+    print(f"long text ({len(long_text)} chars): dict join {old * 1000:.2f} ms, translate {new * 1000:.2f} ms, {old / new:.1f}x faster")
+
+    old = timeit.timeit(lambda: [fix_keyboard_layout_dict(m, 'en', 'ru') for m in messages], number=runs) / runs
+    new = timeit.timeit(lambda: fix_keyboard_layout_many(messages, 'en', 'ru'), number=runs) / runs
+    print(f"bulk ({len(messages)} messages): dict join {old * 1000:.2f} ms, translate {new * 1000:.2f} ms, {old / new:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark: top-k tool subset selection against sending the full catalog.
+Uses a CoinGecko-shaped fixture catalog and labelled user messages; reports
+the prompt size reduction, how often the expected tool is in the subset
+(recall) and how often selection fell back to the full list.
+
+Run from the repository root:
+    python -m backend.benchmarks.tool_selection_bench [--top-k 8]
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from backend.mcp_instructions import get_mcp_instructions
+from backend.tool_selection import TOOL_SELECTION_TOP_K, render_catalog, select_tools
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "coingecko_tools.json")
+COINGECKO_URL = "https://mcp.api.coingecko.com/sse"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top-k", type=int, default=TOOL_SELECTION_TOP_K)
+    args = parser.parse_args()
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        fixture = json.load(f)
+    tools, queries = fixture["tools"], fixture["queries"]
+    full_prompt = len(get_mcp_instructions(COINGECKO_URL, "en", render_catalog(tools)))
+
+    prompt_chars = hits = labelled = fallbacks = 0
+    misses = []
+    for query in queries:
+        subset, fell_back = select_tools(query["message"], tools, args.top_k)
+        fallbacks += fell_back
+        prompt_chars += len(get_mcp_instructions(COINGECKO_URL, "en", render_catalog(subset)))
+        if query["expected"]:
+            labelled += 1
+            names = {tool["name"] for tool in subset}
+            if names & set(query["expected"]):
+                hits += 1
+            else:
+                misses.append(query["message"])
+
+    average = prompt_chars / len(queries)
+    print(f"{len(tools)} tools, {len(queries)} messages ({labelled} needing a tool), top-k {args.top_k}")
+    print(f"tool selection prompt: full catalog {full_prompt} chars, with selection {average:.0f} chars on average, "
+          f"{1 - average / full_prompt:.0%} smaller")
+    print(f"recall: expected tool kept for {hits}/{labelled} messages ({hits / labelled:.0%}), "
+          f"full list kept for {fallbacks}/{len(queries)}")
+    for message in misses:
+        print(f"  missed: {message}")
+
+    runs = 200
+    seconds = timeit.timeit(lambda: [select_tools(q["message"], tools, args.top_k) for q in queries], number=runs)
+    print(f"selection cost: {seconds / runs / len(queries) * 1e6:.0f} us per message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Shared cache for MCP tool catalogs and tool results.
+Backends: per-process memory, a SQLite file shared by all workers on one host,
+or a Redis-compatible server shared across hosts.
+
+Consistency: entries are immutable JSON snapshots with a TTL; the last writer
+wins and nothing is invalidated early, so a worker may serve a value up to TTL
+seconds old. Cache failures are logged and treated as misses.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from . import codec
+from . import metrics
+
+# memory | sqlite | redis | off
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+# SQLite file path or redis://host:port/db
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# TTLs in seconds, 0 disables caching of that kind
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+TOOL_RESULT_CACHE_TTL = float(os.getenv("TOOL_RESULT_CACHE_TTL", "30"))
+
+DEFAULT_SQLITE_PATH = "backend-cache.sqlite3"
+KEY_PREFIX = "3dai:"
+
+
+class MemoryCache:
+    """LRU dict, private to the worker process."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._entries[key] = (value, time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def close(self):
+        self._entries.clear()
+
+    def entries(self) -> list:
+        """Unexpired (key, value, expires) entries, least recently used first."""
+        now = time.time()
+        return [(key, value, expires) for key, (value, expires) in self._entries.items() if expires >= now]
+
+    def restore(self, entries) -> int:
+        """Add saved entries that have not expired; entries already present are kept."""
+        now = time.time()
+        restored = 0
+        for key, value, expires in entries:
+            if expires >= now and key not in self._entries:
+                self._entries[key] = (value, expires)
+                restored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return restored
+
+
+class SQLiteCache:
+    """Table in a SQLite file (WAL mode), shared by the workers on one host."""
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._writes = 0
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str):
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str, ttl: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", (key, value, now + ttl))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    async def get(self, key: str):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class RedisCache:
+    """Minimal RESP client (GET / SET EX) for Redis or any compatible server."""
+    name = "redis"
+
+    def __init__(self, url: str):
+        parsed = urlparse(url or "redis://localhost:6379/0")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip("/") or 0)
+        self.password = parsed.password
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        out = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        return b"".join(out)
+
+    async def _reply(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RuntimeError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            return [await self._reply() for _ in range(max(int(payload), 0))]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    async def _command(self, *args):
+        async with self._lock:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+                if self.password:
+                    self._writer.write(self._encode("AUTH", self.password))
+                    await self._reply()
+                if self.db:
+                    self._writer.write(self._encode("SELECT", self.db))
+                    await self._reply()
+            try:
+                self._writer.write(self._encode(*args))
+                await self._writer.drain()
+                return await self._reply()
+            except BaseException:
+                # Also on cancellation: a reply may still be in flight, so the connection is not reusable
+                self._writer.close()
+                self._reader = self._writer = None
+                raise
+
+    async def get(self, key: str):
+        return await self._command("GET", key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._command("SET", key, value, "PX", max(int(ttl * 1000), 1))
+
+    async def eval(self, script: str, keys: list, args: list):
+        """Run a Lua script atomically on the server."""
+        return await self._command("EVAL", script, len(keys), *keys, *args)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+_cache = None
+
+
+def get_cache():
+    """The cache backend configured by CACHE_BACKEND, or None when caching is off."""
+    global _cache
+    if _cache is None and CACHE_BACKEND != "off":
+        if CACHE_BACKEND == "sqlite":
+            _cache = SQLiteCache(CACHE_URL or DEFAULT_SQLITE_PATH)
+        elif CACHE_BACKEND == "redis":
+            _cache = RedisCache(CACHE_URL)
+        else:
+            _cache = MemoryCache()
+        print(f"[INFO] Cache backend: {_cache.name}")
+    return _cache
+
+
+def make_key(namespace: str, *parts) -> str:
+    digest = hashlib.sha256(codec.dumps_bytes(parts, sort_keys=True)).hexdigest()[:32]
+    return f"{KEY_PREFIX}{namespace}:{digest}"
+
+
+async def cache_get(namespace: str, *parts):
+    """Look up a JSON value; counts hits and misses per namespace."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        raw = await cache.get(make_key(namespace, *parts))
+    except Exception as e:
+        print(f"[DEBUG] Cache get failed ({cache.name}): {e}")
+        metrics.inc("cache_errors_total", cache=namespace, backend=cache.name)
+        return None
+    if raw is None:
+        metrics.inc("cache_misses_total", cache=namespace, backend=cache.name)
+        return None
+    metrics.inc("cache_hits_total", cache=namespace, backend=cache.name)
+    return codec.loads(raw)
+
+
+async def cache_set(namespace: str, value, ttl: float, *parts):
+    """Store a JSON value for ttl seconds."""
+    cache = get_cache()
+    if cache is None or ttl <= 0:
+        return
+    try:
+        await cache.set(make_key(namespace, *parts), codec.dumps(value), ttl)
+    except Exception as e:
+        print(f"[DEBUG] Cache set failed ({cache.name}): {e}")
+        metrics.inc("cache_errors_total", cache=namespace, backend=cache.name)
+
+
+async def close():
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -0,0 +1,113 @@
+"""
+Request cancellation for /chat.
+The pipeline runs in its own task, which is cancelled when the client
+disconnects or when a newer request of the same session arrives (clients send
+sessionId and a requestId per message). Cancellation unwinds through the
+awaits of the pipeline: MCP client sessions exit their context managers,
+hedged LLM calls cancel both attempts, and the Redis cache drops a connection
+interrupted mid-command instead of reusing it.
+
+A newer request may land on another worker. When the cache backend is shared
+(sqlite or redis), each request also publishes its requestId as the latest of
+its session there, and running requests check it every
+SUPERSEDE_POLL_INTERVAL seconds, so supersession works across workers (with
+up to that much delay). The memory backend only supersedes within a worker.
+"""
+
+import asyncio
+import os
+
+from . import cache
+from . import metrics
+
+# Seconds between checks of the shared cache for a newer request of the session; 0 disables
+SUPERSEDE_POLL_INTERVAL = float(os.getenv("SUPERSEDE_POLL_INTERVAL", "1"))
+# How long the latest requestId of a session is kept in the shared cache
+SESSION_TTL = 600
+
+
+class RequestCancelled(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Running:
+    def __init__(self, request_id, task):
+        self.request_id = request_id
+        self.task = task
+        self.reason = None
+
+
+# session id -> its latest running request
+_sessions = {}
+
+
+async def _wait_for_disconnect(receive):
+    # The body has been read, so the next message only arrives when the client goes away
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+def _shared_cache():
+    """The cache backend when it is shared between workers, else None."""
+    backend = cache.get_cache()
+    return backend if backend is not None and backend.name != "memory" else None
+
+
+async def _wait_for_newer(session_id: str, request_id: str):
+    """Return once another request of the session has published itself in the shared cache."""
+    while True:
+        await asyncio.sleep(SUPERSEDE_POLL_INTERVAL)
+        latest = await cache.cache_get("chat_session", session_id)
+        if latest is not None and latest != request_id:
+            return
+
+
+def _supersede(session_id: str, running: _Running):
+    previous = _sessions.get(session_id)
+    _sessions[session_id] = running
+    if previous is None or previous.task.done():
+        return
+    if running.request_id is not None and previous.request_id == running.request_id:
+        # A retry of the same message does not cancel the original
+        return
+    previous.reason = "superseded"
+    previous.task.cancel()
+
+
+async def run_cancellable(coro, receive, session_id: str = None, request_id: str = None):
+    """Await coro in a task, cancelling it on client disconnect or supersession.
+
+    Raises RequestCancelled with the reason when the work was cancelled.
+    """
+    running = _Running(request_id, asyncio.create_task(coro))
+    if session_id:
+        _supersede(session_id, running)
+    watcher = asyncio.create_task(_wait_for_disconnect(receive))
+    newer = None
+    if session_id and request_id and SUPERSEDE_POLL_INTERVAL > 0 and _shared_cache() is not None:
+        await cache.cache_set("chat_session", request_id, SESSION_TTL, session_id)
+        newer = asyncio.create_task(_wait_for_newer(session_id, request_id))
+    try:
+        await asyncio.wait({running.task, watcher} | ({newer} if newer else set()),
+                           return_when=asyncio.FIRST_COMPLETED)
+        if not running.task.done():
+            running.reason = "superseded" if newer is not None and newer.done() else "disconnect"
+            running.task.cancel()
+            await asyncio.wait({running.task})
+        if running.task.cancelled() and running.reason:
+            metrics.inc("requests_cancelled_total", reason=running.reason)
+            raise RequestCancelled(running.reason)
+        return running.task.result()
+    finally:
+        watcher.cancel()
+        if newer is not None:
+            newer.cancel()
+        if not running.task.done():
+            # Our own caller was cancelled (e.g. shutdown)
+            running.task.cancel()
+        if session_id and _sessions.get(session_id) is running:
+            del _sessions[session_id]
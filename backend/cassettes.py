@@ -0,0 +1,199 @@
+"""
+Record-and-replay cassettes of /chat requests.
+With CASSETTE_RECORD_FILE set, each (sampled) request is appended to that
+JSONL file as one line: the ChatRequest, the MCP tool catalogs it used, every
+call_tool result and agent.run output with how long it took, and the final
+response. Cassettes contain user messages, so record only where that is
+acceptable.
+
+backend.loadtest.replay feeds the lines back through stand-ins for the MCP
+client and the LLM agent (see ReplayTape), at full speed or at the recorded
+timing, which benchmarks and regression-tests our own pipeline without the
+network.
+"""
+
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from . import codec
+
+# JSONL file cassettes are appended to; empty disables recording
+CASSETTE_RECORD_FILE = os.getenv("CASSETTE_RECORD_FILE", "")
+# Share of /chat requests recorded
+CASSETTE_SAMPLE_RATE = float(os.getenv("CASSETTE_SAMPLE_RATE", "1"))
+
+_current = ContextVar("cassette", default=None)
+_write_lock = threading.Lock()
+# Last catalog listed per MCP URL, attached to requests answered from the catalog cache
+_catalogs = {}
+# Cassettes being replayed, by request id (set by the replay driver), and their tapes once served
+_replaying = {}
+replayed = {}
+
+
+class Recording:
+    def __init__(self, request: dict):
+        self.line = {
+            "id": uuid.uuid4().hex,
+            "recorded": time.time(),
+            "request": request,
+            "catalogs": {},
+            "events": [],
+            "response": None,
+            "seconds": None,
+        }
+        self.start = time.perf_counter()
+
+    def add(self, event: dict):
+        self.line["events"].append(event)
+
+
+class ReplayTape:
+    """Recorded answers of one cassette, handed out as the pipeline asks for them."""
+
+    def __init__(self, line: dict):
+        self.line = line
+        self.catalogs = line.get("catalogs", {})
+        self.agent_runs = deque(e for e in line["events"] if e["kind"] == "agent_run")
+        self.calls = [e for e in line["events"] if e["kind"] == "call_tool"]
+        self.list_seconds = {e["url"]: e["seconds"] for e in line["events"] if e["kind"] == "list_tools"}
+        self.misses = []
+
+    def next_agent_run(self):
+        if not self.agent_runs:
+            self.misses.append("agent_run")
+            return None
+        return self.agent_runs.popleft()
+
+    def find_call(self, url: str, tool: str, params: dict):
+        """The recorded call with the same arguments, else the next one of the same tool."""
+        for exact in (True, False):
+            for i, event in enumerate(self.calls):
+                if event["url"] == url and event["tool"] == tool and (not exact or event["params"] == params):
+                    return self.calls.pop(i)
+        self.misses.append(f"call_tool {tool}")
+        return None
+
+
+def current():
+    """Recording or ReplayTape of the current request, or None."""
+    return _current.get()
+
+
+@contextmanager
+def session(request):
+    """Record the /chat request in the with-block, or serve it from the cassette being replayed."""
+    if _replaying:
+        line = _replaying.get(request.requestId)
+        tape = ReplayTape(line) if line else None
+        if tape:
+            replayed[line["id"]] = tape
+        token = _current.set(tape)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+        return
+    if not CASSETTE_RECORD_FILE or random.random() >= CASSETTE_SAMPLE_RATE:
+        yield
+        return
+    recording = Recording(request.model_dump(mode="json", exclude_unset=True))
+    token = _current.set(recording)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        recording.line["seconds"] = time.perf_counter() - recording.start
+        try:
+            _append(recording.line)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[DEBUG] Could not record cassette: {e}")
+
+
+def _append(line: dict):
+    data = codec.dumps(line) + "\n"
+    with _write_lock, open(CASSETTE_RECORD_FILE, "a", encoding="utf-8") as f:
+        f.write(data)
+
+
+def _recording():
+    tape = _current.get()
+    return tape if isinstance(tape, Recording) else None
+
+
+def encode_tool_result(result) -> dict:
+    """JSON form of a CallToolResult; content blocks without text are kept as their repr."""
+    return {
+        "content": [getattr(block, "text", None) or str(block) for block in getattr(result, "content", [])],
+        "structured_content": getattr(result, "structured_content", None),
+        "is_error": bool(getattr(result, "is_error", False)),
+    }
+
+
+def record_tools(url: str, tools: list, seconds: float):
+    if not CASSETTE_RECORD_FILE:
+        return
+    _catalogs[url] = [tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in tools]
+    recording = _recording()
+    if recording:
+        recording.line["catalogs"][url] = _catalogs[url]
+        recording.add({"kind": "list_tools", "url": url, "seconds": seconds})
+
+
+def use_catalog(url: str):
+    """A cached catalog served the request: attach the last one listed, if this process listed it."""
+    recording = _recording()
+    if recording and url in _catalogs:
+        recording.line["catalogs"].setdefault(url, _catalogs[url])
+
+
+def record_call(url: str, tool: str, params: dict, seconds: float, result=None, error: str = None,
+                cancelled: bool = False, cached: bool = False):
+    recording = _recording()
+    if recording is None:
+        return
+    event = {"kind": "call_tool", "url": url, "tool": tool, "params": params, "seconds": seconds}
+    if cancelled:
+        event["cancelled"] = True
+    elif error is not None:
+        event["error"] = error
+    else:
+        event["result"] = result if cached else encode_tool_result(result)
+        event["cached"] = cached
+    recording.add(event)
+
+
+def record_agent_run(stage: str, model: str, seconds: float, result=None, error: str = None):
+    recording = _recording()
+    if recording is None:
+        return
+    event = {"kind": "agent_run", "stage": stage, "model": model, "seconds": seconds}
+    if error is not None:
+        event["error"] = error
+    else:
+        event["result"] = {"result": str(result.get("result", ""))} if isinstance(result, dict) else str(result)
+    recording.add(event)
+
+
+def record_response(response: dict):
+    recording = _recording()
+    if recording:
+        recording.line["response"] = response
+
+
+def load(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [codec.loads(line) for line in f if line.strip()]
+
+
+def start_replay(lines: list):
+    """Serve /chat requests whose requestId is a cassette id from that cassette."""
+    _replaying.clear()
+    replayed.clear()
+    _replaying.update((line["id"], line) for line in lines)
@@ -0,0 +1,117 @@
+"""
+JSON codec.
+Uses orjson when it is installed and the stdlib json module otherwise, with one
+conversion path for Pydantic models, dataclasses such as fastmcp's
+CallToolResult and other objects. Text that only goes to the LLM is written
+compact; pretty output is kept for humans.
+"""
+
+import dataclasses
+import json
+import os
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# auto: orjson if installed, stdlib: always the json module
+JSON_CODEC = os.getenv("JSON_CODEC", "auto")
+
+USE_ORJSON = orjson is not None and JSON_CODEC != "stdlib"
+CODEC_NAME = "orjson" if USE_ORJSON else "stdlib"
+
+
+def to_jsonable(obj):
+    """Plain JSON types for obj: Pydantic models are dumped, dataclasses and objects become dicts, the rest str."""
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [to_jsonable(v) for v in obj]
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json", exclude_none=True)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: to_jsonable(getattr(obj, f.name)) for f in dataclasses.fields(obj)}
+    if hasattr(obj, "__dict__"):
+        return to_jsonable(vars(obj))
+    return str(obj)
+
+
+def _default(obj):
+    converted = to_jsonable(obj)
+    if converted is obj:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return converted
+
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj, pretty: bool = False, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 bytes; non-JSON objects go through to_jsonable."""
+    if USE_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib handles
+            pass
+    return _stdlib_dumps(obj, pretty, sort_keys).encode("utf-8")
+
+
+def _stdlib_dumps(obj, pretty: bool, sort_keys: bool) -> str:
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=sort_keys, default=_default)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys, default=_default)
+
+
+def dumps(obj, pretty: bool = False, sort_keys: bool = False) -> str:
+    """Serialize to str (non-ASCII kept as is). Compact unless pretty."""
+    if USE_ORJSON:
+        return dumps_bytes(obj, pretty, sort_keys).decode("utf-8")
+    return _stdlib_dumps(obj, pretty, sort_keys)
+
+
+def for_llm(obj) -> str:
+    """Compact JSON for prompts: no indentation or spaces, which only cost tokens."""
+    return dumps(obj)
+
+
+class CodecJSONResponse(JSONResponse):
+    """Default response class: renders with the codec instead of json.dumps."""
+
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
+
+
+class CodecRequest(Request):
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class CodecRoute(APIRoute):
+    """Route class that parses JSON request bodies with the codec."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def codec_route_handler(request: Request):
+            return await handler(CodecRequest(request.scope, request.receive))
+
+        return codec_route_handler
@@ -0,0 +1,113 @@
+"""
+Response compression middleware.
+Compresses complete JSON and text responses above a size threshold with
+brotli (when the optional brotli package is installed) or gzip, whichever the
+client accepts. Streamed responses are passed through unchanged.
+"""
+
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed, in bytes
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def accepted_encodings(header: str) -> set:
+    """Encodings listed in Accept-Encoding with a non-zero q value."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def choose_encoding(header: str):
+    accepted = accepted_encodings(header)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            body = message.get("body", b"")
+            eligible = (
+                content_type.startswith(COMPRESSIBLE_TYPES)
+                and "content-encoding" not in headers
+                and start["status"] not in (204, 206, 304)
+            )
+            if eligible and "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            if eligible and not message.get("more_body", False) and len(body) >= self.minimum_size:
+                compressed = compress(body, encoding)
+                if len(compressed) < len(body):
+                    metrics.inc("responses_compressed_total", encoding=encoding)
+                    metrics.inc("compression_saved_bytes_total", len(body) - len(compressed), encoding=encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    message = {**message, "body": compressed}
+            passthrough = True
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
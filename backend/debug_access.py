@@ -0,0 +1,33 @@
+"""
+Access to the /debug/* endpoints.
+They expose traces and memory profiles of user requests, rate-limited client
+addresses and learned timeouts, so they are closed by default. DEBUG_ENDPOINTS=1
+opens them; with DEBUG_KEY set, requests must also send that key in the
+X-Debug-Key header. Closed endpoints answer 404, as if they did not exist.
+"""
+
+import hmac
+import os
+
+from fastapi import HTTPException, Request
+
+# Serve the /debug/* endpoints at all
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "0") == "1"
+# Shared key required in the X-Debug-Key header; empty: none required
+DEBUG_KEY = os.getenv("DEBUG_KEY", "")
+HEADER = "x-debug-key"
+
+
+def allowed(headers) -> bool:
+    """Whether a request with these headers may use the debug endpoints."""
+    if not DEBUG_ENDPOINTS:
+        return False
+    if not DEBUG_KEY:
+        return True
+    return hmac.compare_digest(headers.get(HEADER, "").encode(), DEBUG_KEY.encode())
+
+
+def require_debug_access(request: Request):
+    """FastAPI dependency of the /debug/* routes."""
+    if not allowed(request.headers):
+        raise HTTPException(status_code=404, detail="Not Found")
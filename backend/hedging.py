@@ -0,0 +1,176 @@
+"""
+Hedged LLM requests.
+For opted-in model groups, if the primary model has not answered within its
+observed p95 latency, the same prompt is sent to an equivalent model and the
+first answer wins; the other request is cancelled. Hedges are paid for from a
+token budget refilled by a fraction of all requests.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from . import cassettes
+from . import metrics
+from .model_stats import latency_window, summary, record_success, record_error, record_cancelled
+
+# Comma-separated MODEL_GROUPS names to hedge (empty: hedging off)
+HEDGE_GROUPS = {g.strip() for g in os.getenv("HEDGE_GROUPS", "").split(",") if g.strip()}
+# Share of requests that may be hedged, and the burst allowance
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "3"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# Samples needed before the observed percentile is trusted, and the delay used until then
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "10"))
+HEDGE_MIN_DELAY = 0.5
+# Cancellation message for the losing attempt of a hedge
+HEDGE_LOST = "hedge_lost"
+
+# Models that can stand in for each other
+MODEL_GROUPS = {
+    "reasoning": [
+        "deepseek-ai/DeepSeek-R1-0528",
+        "deepseek-ai/DeepSeek-R1",
+        "Qwen/Qwen3-235B-A22B-FP8",
+        "deepseek-ai/DeepSeek-R1-Distill-Llama-70B",
+        "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B",
+        "mistralai/Magistral-Small-2506",
+    ],
+    "large_instruct": [
+        "meta-llama/Llama-3.3-70B-Instruct",
+        "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8",
+        "mistralai/Mistral-Large-Instruct-2411",
+        "google/gemma-3-27b-it",
+        "CohereForAI/aya-expanse-32b",
+    ],
+    "small_instruct": [
+        "mistralai/Ministral-8B-Instruct-2410",
+        "ibm-granite/granite-3.1-8b-instruct",
+        "THUDM/glm-4-9b-chat",
+        "microsoft/phi-4",
+        "openbmb/MiniCPM3-4B",
+    ],
+}
+
+_GROUP_OF = {model: group for group, models in MODEL_GROUPS.items() for model in models}
+
+
+class HedgeBudget:
+    """Token bucket: every request adds HEDGE_BUDGET_RATIO tokens, a hedge spends one."""
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.burst)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+budget = HedgeBudget()
+
+
+def hedge_delay(model: str) -> float:
+    """Seconds to wait for the primary before hedging."""
+    window = latency_window(model)
+    if len(window) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(window.percentile(HEDGE_PERCENTILE), HEDGE_MIN_DELAY)
+
+
+def pick_backup(model: str):
+    """Fastest other model of the same opted-in group (by median latency; unmeasured models last)."""
+    group = _GROUP_OF.get(model)
+    if group not in HEDGE_GROUPS:
+        return None
+    candidates = [m for m in MODEL_GROUPS[group] if m != model]
+    if not candidates:
+        return None
+
+    def median(m):
+        p50 = summary(m)["latency_p50_s"]
+        return p50 if p50 is not None else float("inf")
+
+    return min(candidates, key=lambda m: (median(m), candidates.index(m)))
+
+
+async def _timed_run(agent, model: str, prompt: str):
+    start = time.perf_counter()
+    try:
+        result = await agent.run(prompt)
+    except asyncio.CancelledError as e:
+        # A lost hedge: elapsed time is a lower bound of the real latency and keeps slow
+        # models visible in the percentile. Other cancellations (client gone) say nothing.
+        if e.args == (HEDGE_LOST,):
+            record_cancelled(model, time.perf_counter() - start)
+        raise
+    except Exception:
+        record_error(model, time.perf_counter() - start)
+        raise
+    record_success(model, time.perf_counter() - start, str(result.get("result", "") if isinstance(result, dict) else result))
+    return result
+
+
+async def hedged_run(agent, model: str, prompt: str, make_backup_agent, stage: str = ""):
+    """agent.run(prompt), hedged with make_backup_agent(backup_model) when it is slow.
+
+    Returns (result, model that answered).
+    """
+    start = time.perf_counter()
+    try:
+        result, answered_by = await _hedged_run(agent, model, prompt, make_backup_agent, stage)
+    except Exception as e:
+        cassettes.record_agent_run(stage, model, time.perf_counter() - start, error=str(e))
+        raise
+    cassettes.record_agent_run(stage, answered_by, time.perf_counter() - start, result=result)
+    return result, answered_by
+
+
+async def _hedged_run(agent, model: str, prompt: str, make_backup_agent, stage: str):
+    budget.deposit()
+    primary = asyncio.create_task(_timed_run(agent, model, prompt))
+    backup = None
+    backup_model = pick_backup(model)
+    try:
+        if backup_model is None:
+            return await primary, model
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay(model))
+        if done:
+            return primary.result(), model
+        group = _GROUP_OF[model]
+        if not budget.withdraw():
+            metrics.inc("llm_hedges_skipped_total", group=group, reason="budget")
+            return await primary, model
+
+        print(f"[DEBUG] Hedging {model} with {backup_model} ({stage})")
+        metrics.inc("llm_hedges_total", group=group, model=model, stage=stage)
+        backup = asyncio.create_task(_timed_run(make_backup_agent(backup_model), backup_model, prompt))
+        models = {primary: model, backup: backup_model}
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel(HEDGE_LOST)
+                    winner = "primary" if task is primary else "backup"
+                    metrics.inc("llm_hedge_wins_total", group=group, winner=winner, stage=stage)
+                    return task.result(), models[task]
+                error = task.exception()
+        raise error
+    finally:
+        for task in (primary, backup):
+            if task is not None and not task.done():
+                task.cancel()
@@ -0,0 +1,43 @@
+"""
+HTTP caching for the catalog endpoints.
+ETags are derived from the version of the data (hash of the catalog), so a
+client revalidating with If-None-Match gets an empty 304 when nothing changed.
+"""
+
+import hashlib
+import os
+
+from fastapi import Request, Response
+
+from . import metrics
+from .codec import CodecJSONResponse, dumps_bytes
+
+# Cache-Control max-age for /models and for successful /mcp-tools responses, in seconds
+MODELS_MAX_AGE = int(os.getenv("MODELS_MAX_AGE", "300"))
+MCP_TOOLS_MAX_AGE = int(os.getenv("MCP_TOOLS_MAX_AGE", "60"))
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag for the given version parts."""
+    digest = hashlib.sha256(dumps_bytes(parts, sort_keys=True)).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers etag (weak comparison, as RFC 9110 requires for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def conditional_json(request: Request, content, etag: str, cache_control: str, endpoint: str) -> Response:
+    """JSON response with ETag/Cache-Control, or 304 Not Modified when the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        metrics.inc("http_not_modified_total", endpoint=endpoint)
+        return Response(status_code=304, headers=headers)
+    return CodecJSONResponse(content, headers=headers)
@@ -0,0 +1,51 @@
+"""
+Rolling latency statistics.
+A bounded window of recent samples with exact percentiles, plus an EWMA, for
+decisions that need the current latency of a model or a tool rather than the
+all-time histograms in metrics.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+DEFAULT_WINDOW = 200
+
+
+class LatencyWindow:
+    def __init__(self, size: int = DEFAULT_WINDOW, alpha: float = 0.2):
+        self.samples = deque(maxlen=size)
+        self.alpha = alpha
+        self.ewma = None
+        self.updated = None
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+            self.ewma = seconds if self.ewma is None else self.alpha * seconds + (1 - self.alpha) * self.ewma
+            self.updated = time.time()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def percentile(self, q: float):
+        """Nearest-rank percentile of the window, None when empty."""
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"samples": list(self.samples), "ewma": self.ewma, "updated": self.updated}
+
+    @classmethod
+    def from_dict(cls, data: dict, size: int = DEFAULT_WINDOW, alpha: float = 0.2):
+        window = cls(size, alpha)
+        window.samples.extend(data.get("samples", [])[-size:])
+        window.ewma = data.get("ewma")
+        window.updated = data.get("updated")
+        return window
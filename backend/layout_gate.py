@@ -0,0 +1,129 @@
+"""
+Wrong-layout gate for /chat.
+Flags messages typed in the wrong keyboard layout (e.g. "ghbdtn" for "привет")
+before they reach the LLM, using detect_charset/LAYOUTS and a small character
+bigram model per LANG_CHARSETS language.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+from .layout_tables import LANG_CHARSETS, charset_scores, pick_layout_source, fix_keyboard_layout, changes_text
+from . import metrics
+
+# off: disabled, suggest: answer with the corrected text instead of calling the LLM, correct: fix the message and continue
+LAYOUT_GATE_MODE = os.getenv("LAYOUT_GATE_MODE", "off")
+# Minimum gain in average log-probability per bigram for the converted text to win
+LAYOUT_GATE_MARGIN = float(os.getenv("LAYOUT_GATE_MARGIN", "0.5"))
+LAYOUT_GATE_MIN_CONFIDENCE = 0.9
+LAYOUT_GATE_MIN_LETTERS = 4
+
+# "suggest" mode reply, in the user's language; {text} is the converted message
+SUGGESTION_REPLIES = {
+    'en': "It looks like your message was typed in the wrong keyboard layout. Did you mean: **{text}**?",
+    'ru': "Похоже, сообщение набрано не в той раскладке клавиатуры. Вы имели в виду: **{text}**?",
+    'uk': "Схоже, повідомлення набрано не в тій розкладці клавіатури. Ви мали на увазі: **{text}**?",
+    'de': "Anscheinend wurde Ihre Nachricht im falschen Tastaturlayout eingegeben. Meinten Sie: **{text}**?",
+    'fr': "Il semble que votre message ait été saisi avec la mauvaise disposition de clavier. Vouliez-vous dire : **{text}** ?",
+    'es': "Parece que tu mensaje se escribió con la distribución de teclado equivocada. ¿Quisiste decir: **{text}**?",
+    'it': "Sembra che il messaggio sia stato digitato con il layout di tastiera sbagliato. Intendevi: **{text}**?",
+    'pl': "Wygląda na to, że wiadomość została wpisana w niewłaściwym układzie klawiatury. Czy chodziło o: **{text}**?",
+    'tr': "Mesajınız yanlış klavye düzeniyle yazılmış gibi görünüyor. Şunu mu demek istediniz: **{text}**?",
+    'pt': "Parece que sua mensagem foi digitada no layout de teclado errado. Você quis dizer: **{text}**?",
+    'cs': "Zdá se, že zpráva byla napsána ve špatném rozložení klávesnice. Měli jste na mysli: **{text}**?",
+    'hu': "Úgy tűnik, az üzenetet rossz billentyűzetkiosztással írta be. Erre gondolt: **{text}**?",
+    'el': "Φαίνεται ότι το μήνυμα πληκτρολογήθηκε με λάθος διάταξη πληκτρολογίου. Εννοούσατε: **{text}**;",
+    'fi': "Näyttää siltä, että viesti kirjoitettiin väärällä näppäimistöasettelulla. Tarkoititko: **{text}**?",
+    'sv': "Det verkar som att meddelandet skrevs med fel tangentbordslayout. Menade du: **{text}**?",
+    'da': "Det ser ud til, at beskeden blev skrevet med det forkerte tastaturlayout. Mente du: **{text}**?",
+    'nl': "Het lijkt erop dat je bericht met de verkeerde toetsenbordindeling is getypt. Bedoelde je: **{text}**?",
+}
+
+# Frequent words used to train the bigram models
+LANG_SEED_WORDS = {
+    'en': "the be to of and a in that have it for not on with he as you do at this but his by from they we say her she or an will my one all would there their what so up out if about who get which go me when make can like time no just him know take people into year your good some could them see other than then now look only come its over think also back after use two how our work first well way even new want because any these give day most us hello world price weather thanks please help where why question answer",
+    'ru': "и в не на я быть он с что а по это она этот к но они мы как из у который то за свой весь год от так о для ты же все тот мочь вы человек такой его сказать только или ещё бы себя один уже до время если сам когда другой вот говорить наш мой знать стать при чтобы дело жизнь первый день привет здравствуйте спасибо пожалуйста помощь погода цена сколько стоит почему где объём съесть",
+    'uk': "і в не на я бути він з що а по це вона цей до але вони ми як із у який то за свій все рік від так про для ти ви людина такий його сказати тільки або ще би себе один вже час якщо сам коли інший ось говорити наш мій знати стати при щоб справа життя перший день привіт дякую будь ласка допомога погода ціна скільки коштує чому де їжак єдиний ґанок",
+    'de': "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war haben nur oder aber vor zur bis mehr durch man sein wurde sei hallo danke bitte wetter preis warum wo viel kostet schön grüße straße größe möchte können müssen",
+    'fr': "le de un être et à il avoir ne je son que se qui ce dans en du elle au pour pas vous par sur faire plus dire me on mon lui nous comme mais pouvoir avec tout aller voir bien où sans tu ou leur homme si deux moi vouloir bonjour merci plaît météo prix pourquoi combien coûte très été déjà français garçon noël cœur",
+    'es': "el la de que y a en un ser se no haber por con su para como estar tener le lo todo pero más hacer o poder decir este ir otro ese si me ya ver porque dar cuando él muy sin vez mucho saber qué sobre mi alguno mismo yo también hasta año dos querer entre así primero desde grande hola gracias favor tiempo precio cuánto cuesta dónde señor niño mañana",
+    'it': "il di che e la un a per non in una sono mi ho lo ma ti ci io le si con da cosa questo è ha se del bene tutto della gli mio come più qui perché anche solo ciao grazie prego tempo prezzo quanto costa dove città però già così parlare fare essere avere dire andare vedere sapere volere",
+    'pl': "nie się w na i z jest to że do co jak ale tak o mnie za po czy jestem już tylko ty mi może od dla ja tu był wiem jego być są teraz tym ten bardzo tego dobrze gdzie cześć dziękuję proszę pogoda cena ile kosztuje dlaczego można będzie żeby więc łatwo źle mówić człowiek",
+    'tr': "bir ve bu da ne için çok ben o mi ama var sen daha gibi kadar ile en şey her diye olarak ya sonra değil nasıl evet hayır merhaba teşekkürler lütfen hava fiyat neden nerede kaç güzel iyi gün büyük küçük şimdi çünkü öğrenci ışık",
+    'pt': "de a o que e do da em um para é com não uma os no se na por mais as dos como mas foi ao ele das tem à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso ela entre olá obrigado favor tempo preço quanto custa onde você então coração ação",
+    'cs': "a se na je to v že s z o do jsem ale i jak k by tak jsou pro co už jen po ve mi jsme když bude tady ani nebo byl jeho ten tu všechno dobrý ahoj děkuji prosím počasí cena kolik stojí proč kde člověk říct můžete řeč čas žádný",
+    'hu': "a az és hogy nem is egy ez meg de van csak már el még volt mint ki mi azt kell lesz jó ha én te ő mert most vagy sok itt ott hol miért mennyi szia köszönöm kérem időjárás ár mennyibe kerül szép nagy kicsi ember nő gyerek ünnep tűz őszi",
+    'el': "και το να η ο της του σε με που τα για δεν είναι από την τον θα στο τι στην μου ένα αυτό γεια σας ευχαριστώ παρακαλώ καιρός τιμή πόσο κοστίζει γιατί πού καλημέρα καλά είμαι έχω πολύ άνθρωπος ημέρα",
+    'fi': "ja on ei se että hän oli ovat mutta kun niin kuin tai jos myös mitä vain sitä minä sinä me te he tämä hyvä moi kiitos ole sää hinta paljonko maksaa miksi missä päivä yö älä mennä tehdä sanoa kyllä",
+    'sv': "och i att det som en på är av för med till den har de inte om ett han men var jag sig från vi så kan man när år säga hej tack snälla väder pris hur mycket kostar varför här där också bara efter någon även åka kärlek över",
+    'da': "og i at det er en til på som de med han af for ikke der var mig sig men et har om vi min havde ham hun nu over da fra du ud sin dem os op man hej tak vejret pris hvor meget koster hvorfor hvad også være få øje æble gå",
+    'nl': "de het een en van ik te dat die in is niet je hij zijn op aan met voor er maar om ook als dan wat bij nog uit naar hallo dank wel alsjeblieft weer prijs hoeveel kost waarom waar goed nu kan zou moet heel veel mensen",
+}
+
+_WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+
+@lru_cache(maxsize=None)
+def _bigram_model(lang: str):
+    """Bigram and unigram counts for a language, with ^/$ as word boundaries."""
+    bigrams = Counter()
+    unigrams = Counter()
+    for word in LANG_SEED_WORDS.get(lang, "").split():
+        padded = f"^{word}$"
+        for a, b in zip(padded, padded[1:]):
+            bigrams[a, b] += 1
+            unigrams[a] += 1
+    vocabulary = len({c.lower() for c in LANG_CHARSETS.get(lang, ())}) + 2
+    return bigrams, unigrams, vocabulary
+
+
+def text_score(text: str, lang: str) -> float:
+    """Average log-probability per character bigram of text, relative to a uniform guess over the alphabet."""
+    bigrams, unigrams, vocabulary = _bigram_model(lang)
+    total = 0.0
+    n = 0
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"^{word}$"
+        for a, b in zip(padded, padded[1:]):
+            # Add-one smoothing over the language alphabet
+            total += math.log((bigrams[a, b] + 1) / (unigrams[a] + vocabulary))
+            n += 1
+    return total / n + math.log(vocabulary) if n else 0.0
+
+
+def check_layout(message: str, lang: str):
+    """Return the message converted to lang's layout if it was likely typed in the wrong layout, else None."""
+    ranked = charset_scores(message)
+    detected = pick_layout_source(ranked, lang, LAYOUT_GATE_MIN_CONFIDENCE)
+    if not detected or ranked[0][1] < LAYOUT_GATE_MIN_LETTERS or not changes_text(message, detected, lang):
+        return None
+    converted = fix_keyboard_layout(message, detected, lang)
+    margin = text_score(converted, lang) - text_score(message, detected)
+    print(f"[DEBUG] Layout gate: {detected}->{lang}, margin {margin:.2f}")
+    if margin < LAYOUT_GATE_MARGIN:
+        return None
+    return converted
+
+
+def layout_gate(message: str, lang_code: str):
+    """Run the gate for a /chat message. Returns (decision, converted_text)."""
+    if LAYOUT_GATE_MODE == "off" or not lang_code:
+        return "off", None
+    converted = check_layout(message, lang_code)
+    if converted is None:
+        decision = "pass"
+    elif LAYOUT_GATE_MODE == "correct":
+        decision = "corrected"
+    else:
+        decision = "suggested"
+    metrics.inc("layout_gate_decisions_total", decision=decision)
+    return decision, converted
+
+
+def suggestion_reply(converted: str, lang_code: str) -> str:
+    """Localized "did you mean" reply for suggest mode."""
+    template = SUGGESTION_REPLIES.get(lang_code, SUGGESTION_REPLIES['en'])
+    return template.format(text=converted)
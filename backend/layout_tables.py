@@ -1,5 +1,9 @@
 # layout_tables.py
 
+import os
+from collections import Counter
+from functools import lru_cache
+
 # Таблицы соответствий для популярных языков
 EN_RU_LAYOUT = dict(zip(
     'qwertyuiop[]asdfghjkl;\'zxcvbnm,./`~@#$^&QWERTYUIOP{}ASDFGHJKL:"ZXCVBNM<>?Ёё',
@@ -152,13 +156,164 @@ LANG_CHARSETS = {
     'nl': set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'),
 }
 
+# Codepoint -> bitmask of the LANG_CHARSETS languages containing it
+LANG_ORDER = list(LANG_CHARSETS)
+CHARSET_INDEX = {}
+for _bit, _lang in enumerate(LANG_ORDER):
+    for _c in LANG_CHARSETS[_lang]:
+        CHARSET_INDEX[ord(_c)] = CHARSET_INDEX.get(ord(_c), 0) | (1 << _bit)
+
+# Ties go to the smaller (more specific) charset, then to LANG_CHARSETS order
+_TIE_ORDER = {lang: (len(LANG_CHARSETS[lang]), i) for i, lang in enumerate(LANG_ORDER)}
+
+# Texts at least this long are counted with NumPy when it is installed
+NUMPY_MIN_LENGTH = 10000
+
+@lru_cache(maxsize=1)
+def _numpy_lut():
+    """NumPy and the codepoint -> bitmask lookup array, or None without NumPy.
+
+    Loaded on the first large text rather than at import, so startup does not pay for NumPy.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    lut = np.zeros(max(CHARSET_INDEX) + 2, dtype=np.uint32)
+    for cp, mask in CHARSET_INDEX.items():
+        lut[cp] = mask
+    return np, lut
+
+def _mask_counts(text: str) -> dict:
+    """Count the characters of text per language bitmask in a single pass."""
+    numpy_lut = _numpy_lut() if len(text) >= NUMPY_MIN_LENGTH else None
+    if numpy_lut is not None:
+        np, lut = numpy_lut
+        codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        masks = lut[np.minimum(codepoints, len(lut) - 1)]
+        values, counts = np.unique(masks[masks != 0], return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+    return _masks_from_chars(Counter(text))
+
+def _masks_from_chars(char_counts: dict) -> dict:
+    """Fold per-character counts into per-bitmask counts."""
+    counts = {}
+    for c, n in char_counts.items():
+        mask = CHARSET_INDEX.get(ord(c))
+        if mask and n > 0:
+            counts[mask] = counts.get(mask, 0) + n
+    return counts
+
+def _rank(mask_counts: dict) -> list:
+    scores = [0] * len(LANG_ORDER)
+    letters = 0
+    for mask, count in mask_counts.items():
+        letters += count
+        bit = 0
+        while mask:
+            if mask & 1:
+                scores[bit] += count
+            mask >>= 1
+            bit += 1
+    ranked = sorted(zip(LANG_ORDER, scores), key=lambda item: (-item[1], _TIE_ORDER[item[0]]))
+    return [(lang, score, score / letters if letters else 0.0) for lang, score in ranked]
+
+def charset_scores(text: str) -> list:
+    """Rank LANG_CHARSETS languages for text.
+
+    Returns (lang, score, confidence) tuples, best first. score is the number of
+    characters from the language's charset, confidence the share of all
+    recognised letters it covers.
+    """
+    return _rank(_mask_counts(text))
+
 def detect_charset(text: str):
-    counts = {lang: sum(c in charset for c in text) for lang, charset in LANG_CHARSETS.items()}
     # Возвращаем язык с максимальным количеством совпадений
-    return max(counts, key=counts.get)
+    return charset_scores(text)[0][0]
+
+# str.translate tables compiled once at import
+LAYOUT_TABLES = {pair: str.maketrans(layout) for pair, layout in LAYOUTS.items()}
+
+@lru_cache(maxsize=None)
+def get_layout_table(from_lang: str, to_lang: str):
+    """Translate table for a layout pair; pairs without a direct table are composed via English (e.g. ru→uk)."""
+    table = LAYOUT_TABLES.get((from_lang, to_lang))
+    if table is not None:
+        return table
+    to_en = LAYOUTS.get((from_lang, 'en'))
+    from_en = LAYOUTS.get(('en', to_lang))
+    if to_en is None or from_en is None or from_lang == to_lang:
+        return None
+    return str.maketrans({c: from_en.get(e, e) for c, e in to_en.items()})
+
+def has_layout(from_lang: str, to_lang: str) -> bool:
+    return get_layout_table(from_lang, to_lang) is not None
+
+def changes_text(text, from_lang: str, to_lang: str) -> bool:
+    """True if converting text (or a collection of its characters) would change at least one character."""
+    table = get_layout_table(from_lang, to_lang)
+    if not table:
+        return False
+    return any(table.get(ord(c), c) != c for c in set(text))
+
+def pick_layout_source(ranked: list, lang: str, min_confidence: float):
+    """Language the text was most likely typed in when it should be converted to lang, else None."""
+    detected, score, confidence = ranked[0]
+    if score == 0 or confidence < min_confidence:
+        return None
+    # Text that is equally valid in the requested language needs no fixing
+    if any(l == lang for l, s, _ in ranked if s == score):
+        return None
+    return detected
 
 def fix_keyboard_layout(text: str, from_lang: str, to_lang: str) -> str:
-    layout = LAYOUTS.get((from_lang, to_lang))
-    if layout:
-        return ''.join(layout.get(c, c) for c in text)
-    return text 
\ No newline at end of file
+    table = get_layout_table(from_lang, to_lang)
+    if table:
+        return text.translate(table)
+    return text
+
+def fix_keyboard_layout_many(texts, from_lang: str, to_lang: str) -> list:
+    """Convert many strings with the same layout pair in one call."""
+    table = get_layout_table(from_lang, to_lang)
+    if not table:
+        return list(texts)
+    return [text.translate(table) for text in texts]
+
+class IncrementalLayoutDetector:
+    """Running charset scores and layout conversion for text that grows as the user types.
+
+    Only the part of the text after the common prefix with the previous update is
+    rescored and converted.
+    """
+
+    def __init__(self, min_confidence: float = 0.9, min_letters: int = 3):
+        self.min_confidence = min_confidence
+        self.min_letters = min_letters
+        self.text = ""
+        self.chars = Counter()
+        self.pair = None
+        self.converted = ""
+
+    def update(self, text: str):
+        prefix = len(os.path.commonprefix([self.text, text]))
+        self.chars.subtract(self.text[prefix:])
+        self.chars.update(text[prefix:])
+        if self.pair:
+            self.converted = self.converted[:prefix] + fix_keyboard_layout(text[prefix:], *self.pair)
+        self.text = text
+
+    def scores(self) -> list:
+        return _rank(_masks_from_chars(self.chars))
+
+    def suggest(self, lang: str):
+        """Return (from_lang, confidence, fixed_text) if the text looks typed in the wrong layout."""
+        ranked = self.scores()
+        detected = pick_layout_source(ranked, lang, self.min_confidence)
+        chars = [c for c, n in self.chars.items() if n > 0]
+        if not detected or ranked[0][1] < self.min_letters or not changes_text(chars, detected, lang):
+            self.pair = None
+            return None
+        if self.pair != (detected, lang):
+            self.pair = (detected, lang)
+            self.converted = fix_keyboard_layout(self.text, detected, lang)
+        return detected, ranked[0][2], self.converted
@@ -0,0 +1,73 @@
+"""
+Lazy adapters for heavy SDKs.
+iointel (with pydantic-ai) and fastmcp/mcp are only imported when first used,
+or by the background warm-up that starts once the server is listening, so they
+do not delay the first bind on cold starts.
+"""
+
+import asyncio
+import importlib
+import os
+import time
+
+from . import startup_profile
+
+# Import the SDKs in a background thread after startup; 0 imports on first use only
+WARMUP_IMPORTS = os.getenv("WARMUP_IMPORTS", "1") == "1"
+# Delay before the warm-up starts, in seconds
+WARMUP_DELAY = float(os.getenv("WARMUP_DELAY", "0.5"))
+HEAVY_MODULES = ("fastmcp", "mcp.types", "iointel")
+
+warmup_state = {"status": "pending", "seconds": None, "error": None}
+
+
+class LazyAttr:
+    """Stands in for module.attr; imports the module on first call or attribute access."""
+
+    def __init__(self, module: str, attr: str):
+        self.module = module
+        self.attr = attr
+        self._target = None
+
+    def resolve(self):
+        if self._target is None:
+            self._target = getattr(importlib.import_module(self.module), self.attr)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<lazy {self.module}.{self.attr} ({state})>"
+
+
+def warm_up():
+    """Import the heavy SDKs (blocking)."""
+    start = time.perf_counter()
+    warmup_state["status"] = "running"
+    try:
+        for module in HEAVY_MODULES:
+            importlib.import_module(module)
+        warmup_state["status"] = "done"
+    except Exception as e:
+        warmup_state["status"] = "failed"
+        warmup_state["error"] = f"{type(e).__name__}: {e}"
+        print(f"[DEBUG] Warm-up import failed: {e}")
+    warmup_state["seconds"] = time.perf_counter() - start
+    startup_profile.mark("warmup_" + warmup_state["status"])
+    startup_profile.uninstall()
+
+
+async def warm_up_in_background():
+    """Run warm_up in a thread once the event loop is serving."""
+    if not WARMUP_IMPORTS:
+        warmup_state["status"] = "disabled"
+        startup_profile.uninstall()
+        return
+    await asyncio.sleep(WARMUP_DELAY)
+    await asyncio.to_thread(warm_up)
+    print(f"[INFO] SDK warm-up {warmup_state['status']} in {warmup_state['seconds']:.2f}s")
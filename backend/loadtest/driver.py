@@ -0,0 +1,186 @@
+"""
+Load-test driver for /chat.
+Runs the app in-process on uvicorn with the MCP servers and the LLM replaced by
+stand-ins (stub_mcp, stub_agent), sends concurrent traffic and reports
+throughput, latency percentiles and error rates.
+
+    python -m backend.loadtest.driver --requests 200 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import socket
+import time
+
+import httpx
+import uvicorn
+
+from .stub_agent import StubAgentConfig, install_stub_iointel
+from .stub_redis import start_stub_redis
+from .stub_mcp import COINGECKO_URL, DEEPWIKI_URL, FETCH_URL, StubConfig, build_stub_servers, stub_client_factory
+
+SCENARIOS = {
+    "coingecko": (COINGECKO_URL, ["What is the price of bitcoin?", "Show me the top coins by market cap"]),
+    "deepwiki": (DEEPWIKI_URL, ["How does dependency injection work in fastapi/fastapi?"]),
+    "fetch": (FETCH_URL, ["Summarize https://example.com/news"]),
+    "none": (None, ["Tell me about yourself", "Hello!"]),
+}
+
+TRAITS = {
+    "name": "Loadtest", "age": 30, "role": "assistant", "style": "friendly", "bio": "",
+    "emotional_stability": 0.5, "friendliness": 0.5, "creativity": 0.5, "curiosity": 0.5,
+    "formality": 0.5, "empathy": 0.5, "humor": 0.5,
+}
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def build_request(scenario: str, lang: str) -> dict:
+    mcp_url, messages = SCENARIOS[scenario]
+    return {
+        "message": random.choice(messages),
+        "traits": TRAITS,
+        "history": [],
+        "mcpServer": mcp_url,
+        "lang": lang,
+    }
+
+
+async def run_load(base_url: str, requests: int, concurrency: int, scenarios: list, lang: str, timeout: float):
+    results = []
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(scenarios[i % len(scenarios)])
+
+    async def worker(client):
+        while True:
+            try:
+                scenario = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                r = await client.post("/chat", json=build_request(scenario, lang))
+                ok = r.status_code == 200 and "response" in r.json()
+                error = None if ok else f"HTTP {r.status_code}"
+            except Exception as e:
+                ok, error = False, type(e).__name__
+            results.append({"scenario": scenario, "seconds": time.perf_counter() - start, "ok": ok, "error": error})
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def report(results: list, elapsed: float):
+    print(f"{'scenario':<12}{'requests':>10}{'errors':>8}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'max s':>9}")
+    groups = {"all": results}
+    for r in results:
+        groups.setdefault(r["scenario"], []).append(r)
+    for name, group in groups.items():
+        seconds = [r["seconds"] for r in group if r["ok"]]
+        errors = sum(1 for r in group if not r["ok"])
+        print(f"{name:<12}{len(group):>10}{errors:>8}{percentile(seconds, 0.5):>9.3f}"
+              f"{percentile(seconds, 0.95):>9.3f}{percentile(seconds, 0.99):>9.3f}{max(seconds, default=0):>9.3f}")
+    errors = [r["error"] for r in results if not r["ok"]]
+    print(f"\nThroughput: {len(results) / elapsed:.1f} req/s over {elapsed:.1f} s, "
+          f"error rate {len(errors) / max(len(results), 1):.1%}")
+    for error in sorted(set(errors)):
+        print(f"  {error}: {errors.count(error)}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def main_async(args):
+    agent_config = StubAgentConfig(latency=args.llm_latency, jitter=args.llm_jitter,
+                                   tool_call_ratio=args.tool_call_ratio, answer_chars=args.answer_chars,
+                                   error_ratio=args.llm_error_ratio)
+    install_stub_iointel(agent_config)
+    redis_server = None
+    if args.cache == "redis" and not os.getenv("CACHE_URL"):
+        redis_server, redis_port = await start_stub_redis()
+        os.environ["CACHE_URL"] = f"redis://127.0.0.1:{redis_port}/0"
+    if args.cache:
+        os.environ["CACHE_BACKEND"] = args.cache
+    # Stats learned from stand-ins must not leak into the real state files
+    os.environ.setdefault("TIMEOUT_STATE_FILE", "")
+    os.environ.setdefault("MODEL_STATS_FILE", "")
+    os.environ.setdefault("WARM_SNAPSHOT_FILE", "")
+    # All load comes from one client, which the rate limiter would throttle
+    os.environ.setdefault("RATE_LIMIT_CAPACITY", "0")
+    from backend import main
+
+    main.Client = stub_client_factory(build_stub_servers(
+        StubConfig(latency=args.mcp_latency, jitter=args.mcp_jitter, payload_kb=args.payload_kb)))
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    # Keep the per-request debug output of the app out of the report
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            results, elapsed = await run_load(f"http://127.0.0.1:{port}", args.requests, args.concurrency,
+                                              scenarios, args.lang, args.timeout)
+    finally:
+        server.should_exit = True
+        await serve_task
+        if redis_server is not None:
+            redis_server.close()
+    report(results, elapsed)
+    hits = sum(c["value"] for c in main.metrics.snapshot()["counters"] if c["name"] == "cache_hits_total")
+    misses = sum(c["value"] for c in main.metrics.snapshot()["counters"] if c["name"] == "cache_misses_total")
+    print(f"Cache: {hits:.0f} hits, {misses:.0f} misses")
+    for stage, stats in main.prompt_prefix.snapshot()["stages"].items():
+        print(f"Prompt prefix reuse ({stage}): {stats['reuse_ratio']:.1%} of chars, "
+              f"{stats['hit_rate']:.1%} of calls, deepest shared layers {stats['hits']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /chat against local MCP and LLM stand-ins")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", default="coingecko,deepwiki,fetch,none",
+                        help=f"comma-separated mix of {', '.join(SCENARIOS)}")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--llm-jitter", type=float, default=0.3)
+    parser.add_argument("--llm-error-ratio", type=float, default=0.0)
+    parser.add_argument("--tool-call-ratio", type=float, default=0.8)
+    parser.add_argument("--answer-chars", type=int, default=800)
+    parser.add_argument("--mcp-latency", type=float, default=0.3)
+    parser.add_argument("--mcp-jitter", type=float, default=0.1)
+    parser.add_argument("--payload-kb", type=int, default=20)
+    parser.add_argument("--cache", choices=["memory", "sqlite", "redis", "off"], default=None,
+                        help="cache backend (redis starts a local stand-in unless CACHE_URL is set)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="show the app's debug output")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Replay driver for /chat cassettes (see backend.cassettes).
+Runs the app in-process on uvicorn with the MCP client and the LLM agent
+replaced by stand-ins that answer from the recorded cassettes, sends the
+recorded requests and reports throughput, latency, our own overhead (latency
+minus the recorded MCP and LLM waits) and responses that differ from the
+recording.
+
+    CASSETTE_RECORD_FILE=chat.jsonl uvicorn backend.main:app   # record
+    python -m backend.loadtest.replay chat.jsonl                # full speed
+    python -m backend.loadtest.replay chat.jsonl --speed 1      # recorded timing
+    python -m backend.loadtest.replay chat.jsonl --check        # exit 1 on changed responses
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+import types
+from urllib.parse import urlparse
+
+import httpx
+import uvicorn
+
+from .driver import free_port, percentile, report
+from .stub_agent import StubPersonaConfig
+
+
+def _tape():
+    from backend import cassettes
+    return cassettes.current()
+
+
+def make_replay_agent(speed: float):
+    """Agent class answering agent.run from the current request's cassette."""
+
+    class ReplayAgent:
+        def __init__(self, name=None, instructions="", persona=None, model=None, api_key=None, **kwargs):
+            self.model = model
+
+        async def run(self, prompt: str):
+            tape = _tape()
+            event = tape.next_agent_run() if tape else None
+            if event is None:
+                raise RuntimeError("No recorded agent.run for this request")
+            await asyncio.sleep(event["seconds"] * speed)
+            if "error" in event:
+                raise RuntimeError(event["error"])
+            return event["result"]
+
+    return ReplayAgent
+
+
+def install_replay_iointel(speed: float):
+    module = types.ModuleType("iointel")
+    module.Agent = make_replay_agent(speed)
+    module.PersonaConfig = StubPersonaConfig
+    sys.modules["iointel"] = module
+    return module
+
+
+class ReplayClient:
+    """Drop-in for fastmcp.Client answering from the current request's cassette."""
+
+    def __init__(self, url: str, speed: float, catalogs: dict):
+        self.url = url
+        self.speed = speed
+        self.catalogs = catalogs
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def list_tools(self):
+        from mcp.types import Tool
+        tape = _tape()
+        # Requests served from the catalog cache while recording borrow another cassette's catalog
+        catalog = (tape.catalogs.get(self.url) if tape else None) or self.catalogs.get(self.url)
+        if catalog is None:
+            raise ConnectionError(f"No recorded tool catalog for {self.url}")
+        await asyncio.sleep((tape.list_seconds.get(self.url, 0.0) if tape else 0.0) * self.speed)
+        return [Tool.model_validate(tool) for tool in catalog]
+
+    async def call_tool(self, tool_name: str, params: dict):
+        from fastmcp.client.client import CallToolResult
+        from mcp.types import TextContent
+        tape = _tape()
+        event = tape.find_call(self.url, tool_name, params) if tape else None
+        if event is None:
+            raise RuntimeError(f"No recorded call of {tool_name}")
+        if event.get("cancelled"):
+            # Timed out while recording: wait for the caller's timeout again
+            await asyncio.sleep(3600)
+        await asyncio.sleep(event["seconds"] * self.speed)
+        if "error" in event:
+            raise RuntimeError(event["error"])
+        result = event["result"]
+        return CallToolResult(
+            content=[TextContent(type="text", text=text) for text in result["content"]],
+            structured_content=result.get("structured_content"),
+            meta=None,
+            is_error=result.get("is_error", False),
+        )
+
+
+def replay_client_factory(speed: float, lines: list):
+    catalogs = {}
+    for line in lines:
+        catalogs.update(line.get("catalogs", {}))
+
+    def factory(url, *args, **kwargs):
+        return ReplayClient(url, speed, catalogs)
+    return factory
+
+
+def external_seconds(line: dict) -> float:
+    """Time the recorded request spent waiting on MCP servers and the LLM."""
+    return sum(event["seconds"] for event in line["events"])
+
+
+async def run_replay(base_url: str, lines: list, concurrency: int, timeout: float):
+    results = []
+    queue = asyncio.Queue()
+    for line in lines:
+        queue.put_nowait(line)
+
+    async def worker(client):
+        while True:
+            try:
+                line = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            # The cassette id routes the request to its recording; no session, so nothing is superseded
+            body = {**line["request"], "requestId": line["id"], "sessionId": None}
+            mcp_url = body.get("mcpServer")
+            scenario = (urlparse(mcp_url).netloc or mcp_url) if mcp_url else "none"
+            start = time.perf_counter()
+            response = None
+            try:
+                r = await client.post("/chat", json=body)
+                response = r.json()
+                ok = r.status_code == 200 and "response" in response
+                error = None if ok else f"HTTP {r.status_code}"
+            except Exception as e:
+                ok, error = False, type(e).__name__
+            results.append({"scenario": scenario, "seconds": time.perf_counter() - start, "ok": ok, "error": error,
+                            "line": line, "response": response})
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def report_replay(results: list, speed: float, replayed: dict, show: int = 5):
+    overhead = [r["seconds"] - external_seconds(r["line"]) * speed for r in results if r["ok"]]
+    print(f"Own overhead: p50 {percentile(overhead, 0.5):.3f} s, p95 {percentile(overhead, 0.95):.3f} s "
+          f"(latency minus recorded waits x{speed:g})")
+    changed = [r for r in results if r["response"] != r["line"]["response"]]
+    misses = {line_id: tape.misses for line_id, tape in replayed.items() if tape.misses}
+    print(f"Responses differing from the recording: {len(changed)} of {len(results)}")
+    for r in changed[:show]:
+        recorded = str((r["line"]["response"] or {}).get("response"))[:120]
+        replayed_text = str((r["response"] or {}).get("response"))[:120]
+        print(f"  {r['line']['id']}: recorded {recorded!r}\n  {' ' * len(r['line']['id'])}  replayed {replayed_text!r}")
+    if misses:
+        print(f"Requests asking for calls that were not recorded: {len(misses)}")
+        for line_id, missed in list(misses.items())[:show]:
+            print(f"  {line_id}: {', '.join(missed)}")
+    return len(changed)
+
+
+async def main_async(args):
+    from backend import cassettes
+    lines = [line for path in args.cassettes for line in cassettes.load(path)]
+    if args.limit:
+        lines = lines[:args.limit]
+    lines = lines * args.repeat
+    if not lines:
+        print("No cassettes to replay")
+        return 0
+
+    install_replay_iointel(args.speed)
+    os.environ["CACHE_BACKEND"] = args.cache
+    # Replays are not recorded again, and state learned from them must not leak into the real files
+    os.environ["CASSETTE_RECORD_FILE"] = ""
+    cassettes.CASSETTE_RECORD_FILE = ""
+    os.environ.setdefault("TIMEOUT_STATE_FILE", "")
+    os.environ.setdefault("MODEL_STATS_FILE", "")
+    os.environ.setdefault("WARM_SNAPSHOT_FILE", "")
+    os.environ.setdefault("RATE_LIMIT_CAPACITY", "0")
+    # Each recorded agent.run answers once; a hedge would ask twice
+    os.environ.setdefault("HEDGE_GROUPS", "")
+    from backend import main
+
+    main.Client = replay_client_factory(args.speed, lines)
+    cassettes.start_replay(lines)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            results, elapsed = await run_replay(f"http://127.0.0.1:{port}", lines, args.concurrency, args.timeout)
+    finally:
+        server.should_exit = True
+        await serve_task
+    report(results, elapsed)
+    return report_replay(results, args.speed, cassettes.replayed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /chat cassettes against MCP and LLM stand-ins")
+    parser.add_argument("cassettes", nargs="+", help="JSONL files recorded with CASSETTE_RECORD_FILE")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="share of the recorded MCP/LLM latency to wait (0: full speed, 1: recorded timing)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=1, help="replay every cassette this many times")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N cassettes")
+    parser.add_argument("--cache", choices=["memory", "sqlite", "off"], default="off",
+                        help="cache backend (off replays every recorded call)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any response changed")
+    parser.add_argument("--verbose", action="store_true", help="show the app's debug output")
+    args = parser.parse_args()
+    changed = asyncio.run(main_async(args))
+    if args.check and changed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Stand-in for iointel.Agent for load testing.
+Emits scripted tool calls for the stub MCP servers and answers with
+configurable latency and size, without calling io.net.
+"""
+
+import asyncio
+import json
+import random
+import sys
+import types
+
+# Tool call emitted when the tool selection instructions list the tool
+SCRIPTED_TOOL_CALLS = {
+    "get_simple_price": {"ids": "bitcoin,ethereum", "vs_currencies": "usd"},
+    "get_coins_markets": {"vs_currency": "usd"},
+    "ask_question": {"repoName": "fastapi/fastapi", "question": "How does dependency injection work?"},
+    "fetch": {"url": "https://example.com/news"},
+}
+
+
+class StubAgentConfig:
+    def __init__(self, latency: float = 1.0, jitter: float = 0.3, tool_call_ratio: float = 0.8,
+                 answer_chars: int = 800, error_ratio: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tool_call_ratio = tool_call_ratio
+        self.answer_chars = answer_chars
+        self.error_ratio = error_ratio
+
+
+def make_stub_agent(config: StubAgentConfig):
+    """Build an Agent class bound to config, with the same constructor as iointel.Agent."""
+
+    class StubAgent:
+        def __init__(self, name=None, instructions="", persona=None, model=None, api_key=None, **kwargs):
+            self.name = name
+            self.instructions = instructions or ""
+            self.model = model
+
+        async def run(self, prompt: str):
+            await asyncio.sleep(max(config.latency + random.uniform(-config.jitter, config.jitter), 0))
+            if random.random() < config.error_ratio:
+                raise RuntimeError("Stub inference error")
+            # Final answer call: the prompt carries the tool result
+            if "[Tool " not in prompt:
+                tools = [tool for tool in SCRIPTED_TOOL_CALLS if f"**{tool}**" in self.instructions]
+                if tools and random.random() < config.tool_call_ratio:
+                    tool = random.choice(tools)
+                    return {"result": json.dumps({"tool_call": {"tool": tool, "params": SCRIPTED_TOOL_CALLS[tool]}})}
+            words = "Here is a **stub** answer with a [link](https://example.com) and some text. "
+            return {"result": (words * (config.answer_chars // len(words) + 1))[:config.answer_chars]}
+
+    return StubAgent
+
+
+class StubPersonaConfig:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def install_stub_iointel(config: StubAgentConfig):
+    """Register a stub iointel module so backend.main imports the stand-ins instead of the SDK."""
+    module = types.ModuleType("iointel")
+    module.Agent = make_stub_agent(config)
+    module.PersonaConfig = StubPersonaConfig
+    sys.modules["iointel"] = module
+    return module
@@ -0,0 +1,120 @@
+"""
+In-process MCP stand-ins for load testing.
+CoinGecko-, DeepWiki- and Fetch-shaped fastmcp servers with configurable
+latency and payload sizes, reachable through URLs that route to the same
+instructions as the real servers.
+"""
+
+import asyncio
+import json
+import random
+
+from fastmcp import Client, FastMCP
+
+COINGECKO_URL = "https://stub.coingecko.local/mcp"
+DEEPWIKI_URL = "https://stub.deepwiki.local/mcp"
+FETCH_URL = "https://stub.fetch.local/mcp"
+
+
+class StubConfig:
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, payload_kb: int = 20):
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_kb = payload_kb
+
+    async def wait(self):
+        await asyncio.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+
+
+def build_coingecko(config: StubConfig) -> FastMCP:
+    server = FastMCP("coingecko-stub")
+
+    @server.tool
+    async def get_simple_price(ids: str, vs_currencies: str) -> str:
+        """Get the current price of coins in the given currencies."""
+        await config.wait()
+        return json.dumps({coin: {cur: round(random.uniform(1, 70000), 2) for cur in vs_currencies.split(",")}
+                           for coin in ids.split(",")})
+
+    @server.tool
+    async def get_coins_markets(vs_currency: str) -> str:
+        """List coins with market cap, volume and price change."""
+        await config.wait()
+        count = max(config.payload_kb * 1024 // 400, 1)
+        return json.dumps([
+            {"id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}", "current_price": random.uniform(0.01, 1000),
+             "market_cap": random.randint(10 ** 6, 10 ** 12), "total_volume": random.randint(10 ** 5, 10 ** 10),
+             "price_change_percentage_24h": random.uniform(-10, 10), "image": f"https://example.com/coin-{i}.png"}
+            for i in range(count)
+        ])
+
+    @server.tool
+    async def get_search(query: str) -> str:
+        """Search coins, exchanges and categories."""
+        await config.wait()
+        return json.dumps({"coins": [{"id": query.lower(), "name": query.title(), "market_cap_rank": 1}]})
+
+    return server
+
+
+def build_deepwiki(config: StubConfig) -> FastMCP:
+    server = FastMCP("deepwiki-stub")
+
+    def document(repo: str) -> str:
+        blocks = max(config.payload_kb // 2, 1)
+        paragraph = f"The {repo} project documents its architecture, setup and API in this section. " * 20
+        return "".join(
+            f"<result><url>https://deepwiki.com/{repo}/{i}</url><text># Section {i}\n## Overview\n{paragraph}</text></result>"
+            for i in range(blocks)
+        )
+
+    @server.tool
+    async def read_wiki_structure(repoName: str) -> str:
+        """Get the list of documentation topics for a GitHub repository."""
+        await config.wait()
+        return "\n".join(f"- {i}. Section {i}" for i in range(20))
+
+    @server.tool
+    async def read_wiki_contents(repoName: str) -> str:
+        """View the documentation of a GitHub repository."""
+        await config.wait()
+        return document(repoName)
+
+    @server.tool
+    async def ask_question(repoName: str, question: str) -> str:
+        """Ask any question about a GitHub repository."""
+        await config.wait()
+        return document(repoName)
+
+    return server
+
+
+def build_fetch(config: StubConfig) -> FastMCP:
+    server = FastMCP("fetch-stub")
+
+    @server.tool
+    async def fetch(url: str) -> str:
+        """Fetch a URL and return its content as markdown."""
+        await config.wait()
+        line = f"Content fetched from {url}, paragraph text for load testing.\n"
+        return f"# {url}\n\n" + line * max(config.payload_kb * 1024 // len(line), 1)
+
+    return server
+
+
+def build_stub_servers(config: StubConfig) -> dict:
+    return {
+        COINGECKO_URL: build_coingecko(config),
+        DEEPWIKI_URL: build_deepwiki(config),
+        FETCH_URL: build_fetch(config),
+    }
+
+
+def stub_client_factory(servers: dict):
+    """Drop-in for fastmcp.Client(url, timeout=...) that connects to in-process servers."""
+    def factory(url, *args, **kwargs):
+        server = servers.get(url)
+        if server is None:
+            raise ConnectionError(f"Stub MCP server not found for {url}")
+        return Client(server, timeout=kwargs.get("timeout"))
+    return factory
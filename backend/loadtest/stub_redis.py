@@ -0,0 +1,85 @@
+"""
+Minimal Redis-compatible server (PING, GET, SET with EX/PX, DEL, FLUSHDB, SELECT)
+for exercising CACHE_BACKEND=redis without a Redis install.
+
+    python -m backend.loadtest.stub_redis --port 6379
+"""
+
+import argparse
+import asyncio
+import time
+
+
+class StubRedis:
+    def __init__(self):
+        self.data = {}
+
+    def execute(self, args: list) -> bytes:
+        command = args[0].upper() if args else b""
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command in (b"SELECT", b"AUTH"):
+            return b"+OK\r\n"
+        if command == b"GET":
+            entry = self.data.get(args[1])
+            if entry is None or (entry[1] is not None and entry[1] < time.time()):
+                self.data.pop(args[1], None)
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(entry[0]), entry[0])
+        if command == b"SET":
+            expires = None
+            options = [a.upper() for a in args[3:]]
+            if b"EX" in options:
+                expires = time.time() + float(args[3 + options.index(b"EX") + 1])
+            if b"PX" in options:
+                expires = time.time() + float(args[3 + options.index(b"PX") + 1]) / 1000
+            self.data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if command == b"FLUSHDB":
+            self.data.clear()
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.startswith(b"*"):
+                    args = line.split()
+                else:
+                    args = []
+                    for _ in range(int(line[1:-2])):
+                        length = int((await reader.readline())[1:-2])
+                        args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self.execute(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_stub_redis(host: str = "127.0.0.1", port: int = 0):
+    """Start the server on the running loop; returns (server, port)."""
+    server = await asyncio.start_server(StubRedis().handle, host, port)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _serve(host: str, port: int):
+    server, port = await start_stub_redis(host, port)
+    print(f"[INFO] Stub Redis listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redis-compatible stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
@@ -1,29 +1,68 @@
 import os
-from fastapi import FastAPI, Request
+from . import startup_profile
+startup_profile.install()
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-# Verifiable IO Intelligence SDK usage for GitHub audit
-from iointel import Agent, PersonaConfig
 import uvicorn
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import List, Optional
-from fastmcp import Client
 import re
-import json
 import asyncio
-from backend.layout_tables import LAYOUTS, LANG_CHARSETS, fix_keyboard_layout, detect_charset
-from .mcp_instructions import get_mcp_instructions, get_mcp_final_instructions
+import time
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from backend.layout_tables import fix_keyboard_layout, charset_scores, changes_text, pick_layout_source, IncrementalLayoutDetector
+from .mcp_instructions import get_mcp_instruction_layers, get_mcp_final_instruction_layers, join_layers, server_kind
+from .relevance import compress_tool_result, estimate_tokens, TOOL_RESULT_TOKEN_BUDGET
+from .tool_selection import describe_tool, render_catalog, select_tools
+from .layout_gate import layout_gate, suggestion_reply
+from .offload import run_cpu, monitor_loop_lag
+from . import offload
+from . import metrics
+from . import tracing
+from . import codec
+from .codec import CodecJSONResponse, CodecRoute
+from . import cache
+from .cache import cache_get, cache_set, CATALOG_CACHE_TTL, TOOL_RESULT_CACHE_TTL
+from .lazy_imports import LazyAttr, warm_up_in_background, warmup_state
+from .http_cache import conditional_json, make_etag, MODELS_MAX_AGE, MCP_TOOLS_MAX_AGE
+from .compression import CompressionMiddleware
+from .rate_limit import RateLimitMiddleware
+from . import rate_limit
+from .hedging import hedged_run, MODEL_GROUPS
+from . import model_stats
+from . import adaptive_timeouts
+from . import prompt_prefix
+from . import answer_policy
+from .cancellation import run_cancellable, RequestCancelled
+from . import snapshot
+from . import memory_profile
+from . import cassettes
+from .debug_access import require_debug_access
+
+# Verifiable IO Intelligence SDK usage for GitHub audit
+# iointel and fastmcp are imported on first use or by the background warm-up
+Agent = LazyAttr("iointel", "Agent")
+PersonaConfig = LazyAttr("iointel", "PersonaConfig")
+Client = LazyAttr("fastmcp", "Client")
 
    
 
 # Load environment variables from .env if present
 load_dotenv()
 
-app = FastAPI()
+app = FastAPI(default_response_class=CodecJSONResponse)
+# Parse JSON request bodies with the fast codec
+app.router.route_class = CodecRoute
 
 # Get frontend URL from environment variable
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
+# Per-client token buckets; added first so CORS headers also reach 429 responses
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -32,7 +71,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset",
+                    "RateLimit-Policy", "Retry-After"],
 )
+# gzip/brotli for large JSON responses (e.g. /chat answers with converted docs)
+app.add_middleware(CompressionMiddleware)
 
 class PersonaTraits(BaseModel):
     name: str
@@ -66,12 +109,37 @@ class ChatRequest(BaseModel):
     model: Optional[str] = None
     mcpServer: Optional[str] = None
     lang: Optional[str] = None
+    # A newer requestId in the same sessionId cancels the older request
+    sessionId: Optional[str] = None
+    requestId: Optional[str] = None
+
+DEFAULT_MODEL = "meta-llama/Llama-3.3-70B-Instruct"
+# General-purpose models the "auto" pseudo-model chooses from
+AUTO_MODEL_CANDIDATES = MODEL_GROUPS["large_instruct"] + MODEL_GROUPS["small_instruct"]
+
+# MCP hosts used as metric labels and timeout keys (the servers in src/constants/mcpServers.ts);
+# the client picks the URL, so any other host is labeled "other"
+MCP_LABEL_HOSTS = {h.strip() for h in os.getenv(
+    "MCP_LABEL_HOSTS",
+    "mcp.api.coingecko.com,remote.mcpservers.org,mcp.deepwiki.com,docs.mcp.cloudflare.com,mcp.semgrep.ai,gitmcp.io",
+).split(",") if h.strip()}
+
+# Upper bound on raw tool output fed into relevance ranking
+MAX_RAW_TOOL_RESULT_CHARS = 200000
+
+# Output budget (characters) for converted <result> documents
+SFORMAT_OUTPUT_BUDGET = int(os.getenv("SFORMAT_OUTPUT_BUDGET", "20000"))
+# Documents at least this large are converted in a thread pool
+SFORMAT_PARALLEL_THRESHOLD = int(os.getenv("SFORMAT_PARALLEL_THRESHOLD", "200000"))
+SFORMAT_WORKERS = int(os.getenv("SFORMAT_WORKERS", "4"))
+_RESULT_BLOCK_RE = re.compile(r'<result>(.*?)<\/result>', re.DOTALL)
+_sformat_executor = None
 
-class SafeJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if hasattr(obj, '__dict__'):
-            return obj.__dict__
-        return str(obj)
+# Minimum share of letters the detected charset must cover before /fix-layout converts
+LAYOUT_MIN_CONFIDENCE = float(os.getenv("LAYOUT_MIN_CONFIDENCE", "0.6"))
+# As-you-type suggestions need a higher confidence and a few letters to go on
+LAYOUT_SUGGEST_CONFIDENCE = float(os.getenv("LAYOUT_SUGGEST_CONFIDENCE", "0.9"))
+LAYOUT_SUGGEST_MIN_LETTERS = int(os.getenv("LAYOUT_SUGGEST_MIN_LETTERS", "3"))
 
 # Verifiable IO Intelligence model list for GitHub audit
 AVAILABLE_MODELS = [
@@ -96,38 +164,39 @@ AVAILABLE_MODELS = [
     {"id": "mistralai/Ministral-8B-Instruct-2410", "name": "Ministral-8B-Instruct-2410", "description": "Ministral 8B: Instruct fine-tuned, outperforms similar size models."},
     {"id": "ibm-granite/granite-3.1-8b-instruct", "name": "granite-3.1-8b-instruct", "description": "Granite-3.1-8B-Instruct: Long-context, open-source, instruction-tuned."},
 ]
+# Models used as metric labels as-is; the client picks the model, so others are labeled "other"
+LABELED_MODELS = {m["id"] for m in AVAILABLE_MODELS} | set(model_stats.AUTO_MODELS) | {m for group in MODEL_GROUPS.values() for m in group} | {DEFAULT_MODEL}
 
 async def get_mcp_tools(mcp_url):
+    """Markdown catalog of an MCP server's tools, or an error string."""
+    tools = await get_mcp_tool_specs(mcp_url)
+    if isinstance(tools, list):
+        return render_catalog(tools)
+    return tools
+
+async def get_mcp_tool_specs(mcp_url):
+    """Structured descriptions of an MCP server's tools, or an error string."""
     if not mcp_url:
         return "No tools available"
+    cached = await cache_get("tool_specs", mcp_url)
+    if cached is not None:
+        cassettes.use_catalog(mcp_url)
+        return cached
+    server_label = mcp_server_label(mcp_url)
+    timeout = adaptive_timeouts.timeout_for(server_label, "list_tools", "list_tools")
     try:
-        # Add timeout for the tools listing
-        async with Client(mcp_url, timeout=30) as client:
-            tools = await client.list_tools()
-            # Show name, description, and parameters for each tool
-            tool_descriptions = []
-            for tool in tools:
-                tool_name = getattr(tool, 'name', str(tool))
-                tool_desc = getattr(tool, 'description', '')
-                params = getattr(tool, 'parameters', None)
-                if not params:
-                    params = getattr(tool, 'inputSchema', None)
-                desc = f"- **{tool_name}**: {tool_desc}"
-                if params and isinstance(params, dict) and 'properties' in params:
-                    required_params = params.get('required', [])
-                    if required_params:
-                        param_lines = []
-                        for param_name in required_params:
-                            param_info = params['properties'].get(param_name, {})
-                            param_type = param_info.get('type', 'unknown')
-                            param_desc = param_info.get('description', '')
-                            param_lines.append(f"    - {param_name} ({param_type}): {param_desc}")
-                        if param_lines:
-                            desc += "\n  Required Params:\n" + "\n".join(param_lines)
-                tool_descriptions.append(desc)
+        # Timeout learned from this server's past listings
+        with adaptive_timeouts.track(server_label, "list_tools", timeout):
+            start = time.perf_counter()
+            async with Client(mcp_url, timeout=timeout) as client:
+                tools = await client.list_tools()
+            cassettes.record_tools(mcp_url, tools, time.perf_counter() - start)
             # Print the raw tools list/dict as received from the MCP server
             #print(f"[INFO] Raw tools: {tools}")
-            return "\n".join(tool_descriptions)
+            # Name, description, and parameters for each tool
+            tool_specs = [describe_tool(tool) for tool in tools]
+        await cache_set("tool_specs", tool_specs, CATALOG_CACHE_TTL, mcp_url)
+        return tool_specs
     except Exception as e:
         error_msg = str(e)
         print(f"[DEBUG] Error fetching tools from {mcp_url}: {error_msg}")
@@ -142,7 +211,36 @@ async def get_mcp_tools(mcp_url):
         
         return f"Error fetching tools: {error_msg}"
 
-async def call_mcp_tool(mcp_url, tool_name, params):
+def encode_tool_result(result):
+    """JSON form of a successful text-only CallToolResult for the shared cache, else None."""
+    from fastmcp.client.client import CallToolResult
+    from mcp.types import TextContent
+    if not isinstance(result, CallToolResult) or result.is_error:
+        return None
+    if not all(isinstance(block, TextContent) for block in result.content):
+        return None
+    return {
+        "content": [block.text for block in result.content],
+        "structured_content": result.structured_content,
+    }
+
+def decode_tool_result(cached):
+    from fastmcp.client.client import CallToolResult
+    from mcp.types import TextContent
+    return CallToolResult(
+        content=[TextContent(type="text", text=text) for text in cached["content"]],
+        structured_content=cached.get("structured_content"),
+        meta=None,
+    )
+
+def catalog_tool_label(tool_name, tool_specs) -> str:
+    """tool_name if the server's catalog lists it, else "unknown"."""
+    if isinstance(tool_name, str) and tool_specs and any(spec.get("name") == tool_name for spec in tool_specs):
+        return tool_name
+    return "unknown"
+
+async def call_mcp_tool(mcp_url, tool_name, params, timeout=30.0, tool_label=None):
+    # tool_label: the name adaptive timeouts are learned under (see catalog_tool_label)
     if not mcp_url:
         # No MCP server selected, do not call any tool
         return None
@@ -154,13 +252,29 @@ async def call_mcp_tool(mcp_url, tool_name, params):
             cleaned_params[key] = value
 
     #print(f"[DEBUG] Calling tool {tool_name} with params: {cleaned_params}")
+
+    cached = await cache_get("tool_result", mcp_url, tool_name, cleaned_params)
+    if cached is not None:
+        cassettes.record_call(mcp_url, tool_name, cleaned_params, 0.0, result=cached, cached=True)
+        return decode_tool_result(cached)
     
+    start = time.perf_counter()
     try:
         # Add timeout for the tool call
-        async with Client(mcp_url, timeout=30.0) as client:
-            return await client.call_tool(tool_name, cleaned_params)
+        with adaptive_timeouts.track(mcp_server_label(mcp_url), tool_label or tool_name, timeout):
+            async with Client(mcp_url, timeout=timeout) as client:
+                result = await client.call_tool(tool_name, cleaned_params)
+        cassettes.record_call(mcp_url, tool_name, cleaned_params, time.perf_counter() - start, result=result)
+        encoded = encode_tool_result(result)
+        if encoded is not None:
+            await cache_set("tool_result", encoded, TOOL_RESULT_CACHE_TTL, mcp_url, tool_name, cleaned_params)
+        return result
+    except asyncio.CancelledError:
+        cassettes.record_call(mcp_url, tool_name, cleaned_params, time.perf_counter() - start, cancelled=True)
+        raise
     except Exception as e:
         error_msg = str(e)
+        cassettes.record_call(mcp_url, tool_name, cleaned_params, time.perf_counter() - start, error=error_msg)
         print(f"[DEBUG] Tool call error for {tool_name}: {error_msg}")
         
         # Handle timeout errors specifically
@@ -182,7 +296,7 @@ async def call_mcp_tool(mcp_url, tool_name, params):
 def extract_first_json(text):
     # Try direct JSON parse first
     try:
-        obj = json.loads(text)
+        obj = codec.loads(text)
         if isinstance(obj, dict):
             return obj
     except Exception:
@@ -191,7 +305,7 @@ def extract_first_json(text):
     match = re.search(r'({.*})', text, re.DOTALL)
     if match:
         try:
-            return json.loads(match.group(1))
+            return codec.loads(match.group(1))
         except Exception:
             pass
     return None
@@ -221,65 +335,107 @@ def clean_html(text):
     
     return text.strip()
 
-def convert_sformat_to_markdown(sformat_text):
-    """Convert structured XML-like blocks to Markdown suitable for chatbot responses."""
-    if not sformat_text:
-        return sformat_text
+def _convert_result_block(result):
+    """Convert the body of a single <result> block to a Markdown entry. Returns (url, markdown)."""
+    url_match = re.search(r'<url>(.*?)<\/url>', result)
+    text_match = re.search(r'<text>(.*?)<\/text>', result, re.DOTALL)
+
+    if not url_match or not text_match:
+        # If we can't parse the structure, include the raw result
+        cleaned_result = clean_html(result)
+        return None, f"---\n{cleaned_result}\n"
+
+    url = url_match.group(1).strip()
+    raw_text = text_match.group(1).strip()
+
+    # Convert headings - handle both # and ##### formats
+    markdown = re.sub(r'^# ([^\n]+)', r'### \1', raw_text, flags=re.MULTILINE)
+    markdown = re.sub(r'^## ([^\n]+)', r'#### \1', markdown, flags=re.MULTILINE)
+    markdown = re.sub(r'^##### ([^\n]+)', r'### \1', markdown, flags=re.MULTILINE)
+    markdown = re.sub(r'^###### ([^\n]+)', r'#### \1', markdown, flags=re.MULTILINE)
     
-    # First, try to find structured result blocks
-    results = re.findall(r'<result>(.*?)<\/result>', sformat_text, re.DOTALL)
+    # Clean the HTML and formatting
+    markdown = clean_html(markdown)
     
-    if not results:
-        # If no structured blocks found, return the original text
-        return sformat_text
+    # Clean up the final markdown
+    markdown = re.sub(r'\n\s*\n\s*\n', '\n\n', markdown)  # Remove excessive newlines
+    markdown = re.sub(r'^\s+', '', markdown, flags=re.MULTILINE)  # Remove leading spaces
+    markdown = re.sub(r'\s+$', '', markdown, flags=re.MULTILINE)  # Remove trailing spaces
+
+    # Format each entry like a chatbot message
+    # Extract domain for better link text
+    domain_match = re.search(r'https?://([^/]+)', url)
+    domain = domain_match.group(1) if domain_match else "Source"
     
-    markdown_output = []
+    # Create more descriptive link text
+    if "github.com" in url:
+        link_text = f"GitHub Repository"
+    elif "deepwiki.com" in url:
+        link_text = f"DeepWiki Documentation"
+    elif "developers.cloudflare.com" in url:
+        link_text = f"Cloudflare Documentation"
+    else:
+        link_text = f"{domain} Documentation"
+    
+    chatbot_block = f"""---\n**{link_text}**: [{url}]({url})\n\n{markdown}\n"""
+    return url, chatbot_block
 
-    for result in results:
-        url_match = re.search(r'<url>(.*?)<\/url>', result)
-        text_match = re.search(r'<text>(.*?)<\/text>', result, re.DOTALL)
+def _get_sformat_executor():
+    global _sformat_executor
+    if _sformat_executor is None:
+        _sformat_executor = ThreadPoolExecutor(max_workers=SFORMAT_WORKERS, thread_name_prefix="sformat")
+    return _sformat_executor
 
-        if not url_match or not text_match:
-            # If we can't parse the structure, include the raw result
-            cleaned_result = clean_html(result)
-            markdown_output.append(f"---\n{cleaned_result}\n")
-            continue
+def iter_sformat_markdown(sformat_text):
+    """Lazily yield Markdown entries for <result> blocks, skipping duplicate URLs and passages."""
+    blocks = (match.group(1) for match in _RESULT_BLOCK_RE.finditer(sformat_text))
+    if len(sformat_text) >= SFORMAT_PARALLEL_THRESHOLD:
+        # Convert large documents batch by batch in a thread pool so the budget still stops the work early
+        executor = _get_sformat_executor()
+        def converted_blocks():
+            while True:
+                batch = list(islice(blocks, SFORMAT_WORKERS * 2))
+                if not batch:
+                    return
+                yield from executor.map(_convert_result_block, batch)
+        converted = converted_blocks()
+    else:
+        converted = (_convert_result_block(block) for block in blocks)
 
-        url = url_match.group(1).strip()
-        raw_text = text_match.group(1).strip()
+    seen_urls = set()
+    seen_passages = set()
+    for url, markdown in converted:
+        passage = hash(markdown.split('\n\n', 1)[-1].strip())
+        if (url and url in seen_urls) or passage in seen_passages:
+            continue
+        if url:
+            seen_urls.add(url)
+        seen_passages.add(passage)
+        yield markdown
 
-        # Convert headings - handle both # and ##### formats
-        markdown = re.sub(r'^# ([^\n]+)', r'### \1', raw_text, flags=re.MULTILINE)
-        markdown = re.sub(r'^## ([^\n]+)', r'#### \1', markdown, flags=re.MULTILINE)
-        markdown = re.sub(r'^##### ([^\n]+)', r'### \1', markdown, flags=re.MULTILINE)
-        markdown = re.sub(r'^###### ([^\n]+)', r'#### \1', markdown, flags=re.MULTILINE)
-        
-        # Clean the HTML and formatting
-        markdown = clean_html(markdown)
-        
-        # Clean up the final markdown
-        markdown = re.sub(r'\n\s*\n\s*\n', '\n\n', markdown)  # Remove excessive newlines
-        markdown = re.sub(r'^\s+', '', markdown, flags=re.MULTILINE)  # Remove leading spaces
-        markdown = re.sub(r'\s+$', '', markdown, flags=re.MULTILINE)  # Remove trailing spaces
+def convert_sformat_to_markdown(sformat_text, max_chars=None):
+    """Convert structured XML-like blocks to Markdown suitable for chatbot responses."""
+    if not sformat_text:
+        return sformat_text
+    max_chars = max_chars or SFORMAT_OUTPUT_BUDGET
+    
+    markdown_output = []
+    used = 0
+    truncated = False
+    for block in iter_sformat_markdown(sformat_text):
+        # Always keep the first entry, stop once the output budget is reached
+        if markdown_output and used + len(block) > max_chars:
+            truncated = True
+            break
+        markdown_output.append(block)
+        used += len(block) + 1
 
-        # Format each entry like a chatbot message
-        # Extract domain for better link text
-        domain_match = re.search(r'https?://([^/]+)', url)
-        domain = domain_match.group(1) if domain_match else "Source"
-        
-        # Create more descriptive link text
-        if "github.com" in url:
-            link_text = f"GitHub Repository"
-        elif "deepwiki.com" in url:
-            link_text = f"DeepWiki Documentation"
-        elif "developers.cloudflare.com" in url:
-            link_text = f"Cloudflare Documentation"
-        else:
-            link_text = f"{domain} Documentation"
-        
-        chatbot_block = f"""---\n**{link_text}**: [{url}]({url})\n\n{markdown}\n"""
-        markdown_output.append(chatbot_block)
+    if not markdown_output:
+        # If no structured blocks found, return the original text
+        return sformat_text
 
+    if truncated:
+        markdown_output.append("---\n*More results were omitted.*\n")
     result_markdown = "\n".join(markdown_output)
     # Replace tabs with spaces to avoid code block rendering
     result_markdown = result_markdown.replace('\t', '    ')
@@ -335,6 +491,12 @@ def process_response_for_markdown(response_text):
     """Process response text to convert any structured blocks to Markdown."""
     if not response_text:
         return response_text
+    with tracing.span("process_response_for_markdown", input_chars=len(response_text)) as s:
+        processed = _process_response_for_markdown(response_text)
+        s.set(output_chars=len(str(processed)))
+        return processed
+
+def _process_response_for_markdown(response_text):
     # Check if the response contains structured blocks
     if '<result>' in response_text and '</result>' in response_text:
         return convert_sformat_to_markdown(response_text)
@@ -422,19 +584,19 @@ def convert_calltoolresult_to_markdown(calltoolresult_text):
 
 def summarize_large_json(json_text):
     """Intelligently summarize large JSON data by extracting key information."""
+    # Reached from process_response_for_markdown, so users read this: keep it indented
     try:
-        import json
-        data = json.loads(json_text)
+        data = codec.loads(json_text)
         
         if isinstance(data, list):
             # For arrays, show first few items and summary
             if len(data) > 10:
                 summary = f"Array with {len(data)} items. First 5 items:\n"
-                summary += json.dumps(data[:5], indent=2, ensure_ascii=False)
+                summary += codec.dumps(data[:5], pretty=True)
                 summary += f"\n\n... and {len(data) - 5} more items"
                 return summary
             else:
-                return json.dumps(data, indent=2, ensure_ascii=False)
+                return codec.dumps(data, pretty=True)
         
         elif isinstance(data, dict):
             # For objects, show key structure and first few values
@@ -447,7 +609,7 @@ def summarize_large_json(json_text):
                 summary += f"\n... and {len(keys) - 5} more keys"
                 return summary
             else:
-                return json.dumps(data, indent=2, ensure_ascii=False)
+                return codec.dumps(data, pretty=True)
         
         else:
             return str(data)
@@ -482,17 +644,6 @@ def format_urls_in_text(text):
     
     return formatted_text
 
-def detect_charset(text: str):
-    counts = {lang: sum(c in charset for c in text) for lang, charset in LANG_CHARSETS.items()}
-    # Возвращаем язык с максимальным количеством совпадений
-    return max(counts, key=counts.get)
-
-def fix_keyboard_layout(text: str, from_lang: str, to_lang: str) -> str:
-    layout = LAYOUTS.get((from_lang, to_lang))
-    if layout:
-        return ''.join(layout.get(c, c) for c in text)
-    return text
-
 def summarize_tool_result(result, max_items=3, max_chars=500):
     if isinstance(result, list):
         preview = result[:max_items]
@@ -580,10 +731,123 @@ def truncate_json_array(data, max_items=50):
         return data[:max_items]
     return data
 
+def estimate_payload_size(result):
+    """Rough size in characters of a tool result, without serializing it."""
+    if isinstance(result, str):
+        return len(result)
+    if isinstance(result, dict) and isinstance(result.get('content'), list):
+        size = 0
+        for item in result['content']:
+            text = getattr(item, 'text', None) or (item.get('text') if isinstance(item, dict) else None)
+            size += len(text or '')
+        return size
+    if isinstance(result, (dict, list)):
+        return len(result) * 100
+    return 0
+
+def build_readable_result(serializable_result):
+    """Turn a tool result into text, uncompressed; direct answers are rendered from it."""
+    with tracing.span("build_readable_result") as s:
+        readable_result = _build_readable_result(serializable_result)
+        s.set(result_chars=len(str(readable_result)))
+        return readable_result
+
+def compress_readable_result(readable_result, query, max_tokens=None):
+    """Keep only the chunks of a readable result most relevant to the user's message, for the final LLM call."""
+    original_length = len(str(readable_result))
+    with tracing.span("compress_tool_result", input_chars=original_length):
+        readable_result = compress_tool_result(readable_result, query, max_tokens)
+    print(f"[DEBUG] Tool result compressed from {original_length} to {len(str(readable_result))} characters")
+    return readable_result
+
+def _build_readable_result(serializable_result):
+    # Универсальная обработка результата инструмента
+    readable_result = None
+    # Попытка извлечь текст из CallToolResult/content/TextContent
+    if isinstance(serializable_result, dict) and 'content' in serializable_result:
+        content = serializable_result['content']
+        if isinstance(content, list) and content:
+            text_item = content[0]
+            text = getattr(text_item, 'text', None) or (text_item.get('text') if isinstance(text_item, dict) else None)
+            if text:
+                try:
+                    parsed = codec.loads(text)
+                    parsed = truncate_json_array(parsed, max_items=50)
+                    # Only the LLM reads this, so no indentation
+                    readable_result = codec.for_llm(parsed)
+                except Exception:
+                    readable_result = text
+    # Если не CallToolResult, но результат простой (dict, list, str)
+    if readable_result is None:
+        if isinstance(serializable_result, (dict, list)):
+            try:
+                readable_result = codec.for_llm(serializable_result)
+            except Exception:
+                readable_result = str(serializable_result)
+        elif isinstance(serializable_result, str):
+            readable_result = serializable_result
+    if not readable_result:
+        readable_result = summarize_tool_result(serializable_result)
+    if isinstance(readable_result, str) and len(readable_result) > MAX_RAW_TOOL_RESULT_CHARS:
+        readable_result = readable_result[:MAX_RAW_TOOL_RESULT_CHARS]
+    return readable_result
+
+def mcp_server_label(mcp_url):
+    """Metric label for an MCP server: its host if listed in MCP_LABEL_HOSTS, "other" if not, "none" for LLM-only requests."""
+    if not mcp_url:
+        return "none"
+    host = urlparse(mcp_url).netloc
+    return host if host in MCP_LABEL_HOSTS else "other"
+
+def model_label(model_name):
+    """Metric label for a model: its id if we list it (or an auto pseudo-model), else "other"."""
+    return model_name if model_name in LABELED_MODELS else "other"
+
 @app.post("/chat")
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request, response: Response):
+    model = model_label(req.model or DEFAULT_MODEL)
+    server_label = mcp_server_label(req.mcpServer)
+    with metrics.timer("chat_request_seconds", model=model, mcp_server=server_label), \
+            tracing.span("chat", model=model, mcp_server=server_label,
+                         message_chars=len(req.message), history_messages=len(req.history)) as root_span:
+        response.headers["X-Trace-Id"] = root_span.trace["trace_id"]
+        try:
+            # Opt-in tracemalloc profile per stage, see /debug/memory
+            with memory_profile.profile_request(root_span.trace["trace_id"], request.headers), \
+                    cassettes.session(req):
+                try:
+                    # Stops the LLM and MCP work when the client goes away or sends a newer message
+                    result = await run_cancellable(handle_chat(req), request.receive, req.sessionId, req.requestId)
+                except RequestCancelled as e:
+                    cassettes.record_response({"response": None, "cancelled": e.reason})
+                    raise
+                cassettes.record_response(result)
+        except RequestCancelled as e:
+            print(f"[STATUS] request cancelled: {e.reason}")
+            root_span.set(cancelled=e.reason)
+            # 499 (client closed request) is never read; a superseded request may still be waited on
+            status = 409 if e.reason == "superseded" else 499
+            return CodecJSONResponse({"response": None, "cancelled": e.reason}, status_code=status,
+                                     headers={"X-Trace-Id": root_span.trace["trace_id"]})
+        root_span.set(response_chars=len(str(result.get("response", ""))))
+        return result
+
+async def handle_chat(req: ChatRequest):
     #print(f"[DEBUG] Received request with lang: {req.lang}")
     print(f"[DEBUG] Request message: {req.message}")
+
+    # Catch messages typed in the wrong keyboard layout before spending an LLM call
+    gate_lang = req.lang.split('-')[0] if req.lang else None
+    gate_decision, converted_message = layout_gate(req.message, gate_lang)
+    if gate_decision == "suggested":
+        # The client offers layout_suggestion as a "did you mean" chip that resends it
+        return {
+            "response": suggestion_reply(converted_message, gate_lang),
+            "layout_suggestion": converted_message,
+        }
+    if gate_decision == "corrected":
+        print(f"[DEBUG] Message corrected by layout gate: {converted_message}")
+        req.message = converted_message
     
     persona = PersonaConfig(
         name=req.traits.name,
@@ -606,17 +870,27 @@ async def chat(req: ChatRequest):
         description=req.traits.description,
     )
     #print("[DEBUG]Received persona traits:", json.dumps(persona.model_dump(), indent=2, ensure_ascii=False))
-    model_name = req.model or "meta-llama/Llama-3.3-70B-Instruct"
+    model_name = req.model or DEFAULT_MODEL
     mcp_url = req.mcpServer  # None means LLM only
+    server_label = mcp_server_label(mcp_url)
 
+    tool_specs = None
     try:
-        tools_context = await asyncio.wait_for(get_mcp_tools(mcp_url), timeout=30)
+        with metrics.timer("mcp_list_tools_seconds", mcp_server=server_label), \
+                tracing.span("get_mcp_tools", mcp_server=server_label) as tools_span:
+            list_timeout = adaptive_timeouts.timeout_for(server_label, "list_tools", "list_tools")
+            tools_context = await asyncio.wait_for(get_mcp_tool_specs(mcp_url), timeout=list_timeout)
+            if isinstance(tools_context, list):
+                tool_specs = tools_context
+                tools_context = render_catalog(tool_specs)
+            tools_span.set(tools_chars=len(str(tools_context)))
         print(f"[STATUS] tools got")
         print(f"[DEBUG] Tools context size: {len(str(tools_context))} characters")
         #print(f"[INFO] Tools for LLM:\n{tools_context}")
 
     except asyncio.TimeoutError:
         tools_context = "Error: MCP server did not respond in time."
+        metrics.inc("mcp_timeouts_total", mcp_server=server_label, operation="list_tools")
         print("[DEBUG] MCP server timeout.")
     except Exception as e:
         error_msg = str(e)
@@ -651,24 +925,53 @@ async def chat(req: ChatRequest):
     #print(f"[DEBUG] Final lang_code: {lang_code}")
     #print(f"[DEBUG] Final lang_instruction: {lang_instruction}")
     
-    # Get MCP-specific instructions
-    tool_selection_instructions = get_mcp_instructions(mcp_url, lang_code, tools_context)
+    # Only the tools relevant to the message go into the prompt; tools_context keeps the full
+    # catalog for checking the tool the LLM picks
+    prompt_tools = tools_context
+    if tool_specs:
+        with tracing.span("select_tools", mcp_server=server_label, tools=len(tool_specs)) as select_span:
+            previous = [m.content for m in req.history if m.role == "user" and isinstance(m.content, str)]
+            selected, kept_all = select_tools(" ".join(previous[-1:] + [req.message]), tool_specs)
+            if not kept_all:
+                prompt_tools = render_catalog(selected)
+            select_span.set(selected=len(selected), prompt_tools_chars=len(prompt_tools))
+        metrics.inc("tool_selection_total", mcp_server=server_label, outcome="full" if kept_all else "subset")
+        metrics.inc("tool_catalog_chars_saved_total", len(tools_context) - len(prompt_tools), mcp_server=server_label)
+        print(f"[INFO] Tools in prompt: {len(selected)} of {len(tool_specs)}")
+
+    answer_profile = server_kind(mcp_url)
+
+    # Get MCP-specific instructions: static rules, versioned catalog, then the language line
+    tool_selection_layers = get_mcp_instruction_layers(mcp_url, lang_code, prompt_tools)
+    tool_selection_instructions = join_layers(tool_selection_layers)
     
     # Get MCP-specific final instructions
-    final_answer_instructions = get_mcp_final_instructions(mcp_url, lang_code)
+    final_answer_layers = get_mcp_final_instruction_layers(mcp_url, lang_code)
+    final_answer_instructions = join_layers(final_answer_layers)
     
     # Build conversation prompt from history (only user and assistant messages)
-    prompt = ""
+    history_text = ""
     for msg in req.history:
         if msg.role in ["user", "assistant"] and isinstance(msg.content, str) and msg.content.strip():
             role = "User" if msg.role == "user" else "Assistant"
-            prompt += f"{role}: {msg.content}\n"
-    prompt += f"User: {req.message}\nAssistant:"
+            history_text += f"{role}: {msg.content}\n"
+    user_turn = f"User: {req.message}\n"
+    prompt = history_text + user_turn + "Assistant:"
+    # The persona opens the agent's system prompt, so it is the first prefix layer
+    persona_layer = ("persona", codec.dumps(req.traits, sort_keys=True))
 
     # Print the total length of the full context (instructions + prompt) sent to the LLM
     full_context = str(tool_selection_instructions) + str(prompt)
     print(f"[INFO] Total LLM context length: {len(full_context)} characters")
 
+    if model_name in model_stats.AUTO_MODELS:
+        # Room for the tool result added to the final answer prompt
+        needed_tokens = estimate_tokens(full_context) + (TOOL_RESULT_TOKEN_BUDGET if mcp_url else 0)
+        model_name = model_stats.pick_model(AUTO_MODEL_CANDIDATES, needed_tokens, DEFAULT_MODEL)
+        print(f"[INFO] Auto model selected: {model_name}")
+    prompt_prefix.observe("tool_selection", model_name,
+                          [persona_layer, *tool_selection_layers, ("history", history_text), ("message", user_turn)])
+
     # Verifiable IO Intelligence inference call for GitHub audit
     agent = Agent(
         name=persona.name,
@@ -679,7 +982,16 @@ async def chat(req: ChatRequest):
     )
     #print(f"[DEBUG] Final prompt sent to LLM:\n{tool_selection_instructions}\n---\n{prompt}\n---")
    
-    response = await agent.run(prompt)
+    with metrics.timer("llm_request_seconds", model=model_label(model_name), stage="tool_selection"), \
+            tracing.span("agent.run", model=model_label(model_name), stage="tool_selection",
+                         prompt_chars=len(full_context)) as llm_span:
+        response, answered_by = await hedged_run(
+            agent, model_name, prompt,
+            lambda backup_model: Agent(name=persona.name, instructions=tool_selection_instructions, persona=persona,
+                                       model=backup_model, api_key=os.environ.get("IO_API_KEY")),
+            stage="tool_selection",
+        )
+        llm_span.set(answered_by=answered_by, response_chars=len(str(response)))
     print(f"[DEBUG] LLM output after tool call:\n{response}")
    
     # Check if the initial response contains structured <result> blocks
@@ -734,14 +1046,25 @@ async def chat(req: ChatRequest):
             return {"response": f"I cannot call the tool '{tool_name}' because it's not available. Please ask me about cryptocurrency data using the available tools."}
         
        # print(f"[DEBUG] Tools context available: {len(str(tools_context))} chars")
-        
+
+        # The name comes from LLM output: metric labels and timeout keys only use names the server listed
+        tool_label = catalog_tool_label(tool_name, tool_specs)
         try:
-            tool_result = await asyncio.wait_for(call_mcp_tool(mcp_url, tool_name, params), timeout=60)
+            with metrics.timer("mcp_tool_call_seconds", mcp_server=server_label, tool=tool_label), \
+                    tracing.span("call_mcp_tool", mcp_server=server_label, tool=tool_label,
+                                 params_chars=len(str(params))) as tool_span:
+                tool_timeout = adaptive_timeouts.timeout_for(server_label, tool_label)
+                tool_span.set(timeout=tool_timeout)
+                tool_result = await asyncio.wait_for(
+                    call_mcp_tool(mcp_url, tool_name, params, tool_timeout, tool_label=tool_label),
+                    timeout=tool_timeout)
+                tool_span.set(result_chars=estimate_payload_size(getattr(tool_result, '__dict__', tool_result)))
         except asyncio.TimeoutError:
+            metrics.inc("mcp_timeouts_total", mcp_server=server_label, operation="call_tool")
             print(f"[DEBUG] Tool call timeout for {tool_name}")
             tool_result = {
                 "error": f"Tool {tool_name} timed out. The MCP server took too long to respond.",
-                "details": "Timeout after 60 seconds"
+                "details": f"Timeout after {tool_timeout:.1f} seconds"
             }
         except Exception as e:
             print(f"[DEBUG] Tool call exception for {tool_name}: {e}")
@@ -751,55 +1074,43 @@ async def chat(req: ChatRequest):
             else:
                 tool_result = {"error": f"Tool call failed: {error_msg}"}
         
+        if isinstance(tool_result, dict) and "error" in tool_result:
+            metrics.inc("mcp_tool_errors_total", mcp_server=server_label, tool=tool_label)
+
         # DEBUG: print raw tool_result
         print(f"[DEBUG] Raw tool_result for {tool_name}: {repr(tool_result)}")
 
-        # Convert CallToolResult to a serializable dict or string
-        if hasattr(tool_result, 'output'):
-            serializable_result = tool_result.output
-        elif hasattr(tool_result, 'result'):
-            serializable_result = tool_result.result
-        else:
-            try:
-                serializable_result = tool_result.__dict__
-            except Exception:
-                serializable_result = str(tool_result)
+        # Convert CallToolResult (or an error dict) to plain JSON types
+        serializable_result = codec.to_jsonable(
+            getattr(tool_result, 'output', None) or getattr(tool_result, 'result', None) or tool_result
+        )
         
-        # Универсальная обработка результата инструмента
-        readable_result = None
-        # Попытка извлечь текст из CallToolResult/content/TextContent
-        if isinstance(serializable_result, dict) and 'content' in serializable_result:
-            content = serializable_result['content']
-            if isinstance(content, list) and content:
-                text_item = content[0]
-                text = getattr(text_item, 'text', None) or (text_item.get('text') if isinstance(text_item, dict) else None)
-                if text:
-                    try:
-                        parsed = json.loads(text)
-                        parsed = truncate_json_array(parsed, max_items=10)
-                        pretty = json.dumps(parsed, indent=2, ensure_ascii=False)
-                        if len(pretty) < 10000:
-                            readable_result = pretty
-                        else:
-                            readable_result = pretty[:10000] + "\n... (truncated)"
-                    except Exception:
-                        readable_result = text if len(text) < 10000 else text[:10000] + "\n... (truncated)"
-        # Если не CallToolResult, но результат простой (dict, list, str)
-        if readable_result is None:
-            if isinstance(serializable_result, (dict, list)):
-                try:
-                    result_str = json.dumps(serializable_result, indent=2, ensure_ascii=False)
-                except Exception:
-                    result_str = str(serializable_result)
-                if len(result_str) < 10000:
-                    readable_result = result_str
-                else:
-                    readable_result = result_str[:10000] + "\n... (truncated)"
-            elif isinstance(serializable_result, str):
-                readable_result = serializable_result if len(serializable_result) < 10000 else serializable_result[:10000] + "\n... (truncated)"
-        if not readable_result:
-            readable_result = summarize_tool_result(serializable_result)
+        with metrics.timer("tool_result_conversion_seconds", mcp_server=server_label):
+            readable_result = await run_cpu(
+                "tool_result", build_readable_result, serializable_result,
+                size=estimate_payload_size(serializable_result),
+            )
         print(f"[DEBUG] readable_result for {tool_name}: {repr(readable_result)}")
+
+        # Per-profile policy: documentation results can be returned rendered, without the final LLM call
+        answer_path = answer_policy.choose_path(answer_profile, lang_code, serializable_result, readable_result)
+        metrics.inc("answer_path_total", mcp_server=server_label, profile=answer_profile,
+                    policy=answer_policy.policy_for(answer_profile), path=answer_path)
+        print(f"[INFO] Answer path for {tool_name}: {answer_path}")
+        if answer_path in ("direct", "lead_in"):
+            # Rendered from the uncompressed text: convert_sformat_to_markdown keeps it within SFORMAT_OUTPUT_BUDGET
+            with tracing.span("render_tool_answer", path=answer_path, result_chars=len(readable_result)):
+                rendered = await run_cpu(
+                    "markdown", process_response_for_markdown, readable_result, size=len(readable_result),
+                )
+                response = {"result": answer_policy.render_answer(answer_path, answer_profile, rendered)}
+            break
+        # Only the LLM reads the compressed result; the excerpt path gets a short final call with the top-ranked part
+        excerpt_tokens = answer_policy.ANSWER_EXCERPT_TOKENS if answer_path == "excerpt" else None
+        readable_result = await run_cpu(
+            "tool_result", compress_readable_result, readable_result, req.message, excerpt_tokens,
+            size=len(str(readable_result)),
+        )
         summarized_result = readable_result
         summarized_result_str = str(summarized_result)
         # Create a new agent with final answer instructions for processing tool results
@@ -809,21 +1120,32 @@ async def chat(req: ChatRequest):
             persona=persona,
             model=model_name,
         )
-        tool_prompt = (
-            prompt
-            + f"\n[Tool {tool_name} result: {summarized_result_str}]\n"
+        # Conversation first, the tool result (the most variable part) last; the answer rules
+        # are static and live in the final instructions
+        tool_result_turn = (
+            f"[Tool {tool_name} result: {summarized_result_str}]\n"
             + f"IMPORTANT: You MUST respond in the user's language (code: {lang_code}) ONLY. Do not use any other language.\n"
-            + "Assistant: Based on the tool result above, provide a helpful answer to the user's original question. "
-            + "IMPORTANT: If the tool result contains any URLs or links, you MUST include them in your response. "
-            + "Format all links as [Description](URL) with descriptive text. "
-            + "Do not just mention that links exist - actually include them in your response."
+            + "Assistant:"
         )
+        tool_prompt = history_text + user_turn + tool_result_turn
+        prompt_prefix.observe("final_answer", model_name,
+                              [persona_layer, *final_answer_layers, ("history", history_text),
+                               ("message", user_turn), ("tool_result", tool_result_turn)])
         print(f"[DEBUG] tool_prompt for {tool_name}: {tool_prompt}")
         # Print the total length of the full context (final instructions + tool_prompt) for the final answer
         final_full_context = str(final_answer_instructions) + str(tool_prompt)
         print(f"[INFO] Total FINAL LLM context length: {len(final_full_context)} characters")
         
-        response = await final_answer_agent.run(tool_prompt)
+        with metrics.timer("llm_request_seconds", model=model_label(model_name), stage="final_answer"), \
+                tracing.span("agent.run", model=model_label(model_name), stage="final_answer",
+                             prompt_chars=len(final_full_context)) as llm_span:
+            response, answered_by = await hedged_run(
+                final_answer_agent, model_name, tool_prompt,
+                lambda backup_model: Agent(name=persona.name, instructions=final_answer_instructions,
+                                           persona=persona, model=backup_model),
+                stage="final_answer",
+            )
+            llm_span.set(answered_by=answered_by, response_chars=len(str(response)))
         #print(f"[DEBUG] LLM output after tool post-processing:\n{response}")
         
        
@@ -831,6 +1153,7 @@ async def chat(req: ChatRequest):
         # Safeguard: if LLM outputs another tool call after tool result, break and return fallback
         if isinstance(response, dict) and "tool_call" in response:
             print("[DEBUG] LLM output another tool call after tool result, breaking")
+            metrics.inc("tool_loop_breaks_total", reason="tool_call_after_result")
             return {"response": "I could not generate a natural language answer after using the tool."}
        # print(f"[STATUS] result got for tool: {tool_name}")
     # Ensure response is always a string for the frontend
@@ -838,11 +1161,15 @@ async def chat(req: ChatRequest):
         # Check if this is still a tool call that wasn't processed
         if "tool_call" in response:
             print("[DEBUG] Response is still a tool call, this shouldn't happen")
+            metrics.inc("tool_loop_breaks_total", reason="max_loops")
             return {"response": "I encountered an error processing the tool call. Please try again."}
         
         main_message = response.get("result") or response.get("output") or str(response)
         # Process the response for Markdown conversion
-        processed_message = process_response_for_markdown(main_message)
+        processed_message = await run_cpu(
+            "markdown", process_response_for_markdown, main_message,
+            size=len(main_message) if isinstance(main_message, str) else 0,
+        )
         # Replace tabs with spaces as the final step
         if isinstance(processed_message, str):
             #print(f"[DEBUG] Before tab replace: {repr(processed_message[:200])} (length: {len(processed_message)})")
@@ -851,7 +1178,10 @@ async def chat(req: ChatRequest):
         return {"response": processed_message}
     
     # Process string response for Markdown conversion
-    processed_response = process_response_for_markdown(response)
+    processed_response = await run_cpu(
+        "markdown", process_response_for_markdown, response,
+        size=len(response) if isinstance(response, str) else 0,
+    )
     # Replace tabs with spaces as the final step
     if isinstance(processed_response, str):
         print(f"[DEBUG] Before tab replace: {repr(processed_response[:200])} (length: {len(processed_response)})")
@@ -859,19 +1189,126 @@ async def chat(req: ChatRequest):
         print(f"[DEBUG] After tab replace: {repr(processed_response[:200])} (length: {len(processed_response)})")
     return {"response": processed_response}
 
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    adaptive_timeouts.load()
+    model_stats.load()
+    # Catalogs, tool results and learned latencies from before the restart, before traffic is accepted
+    snapshot.load()
+    startup_profile.mark("snapshot_loaded")
+    app.state.snapshot_task = asyncio.create_task(snapshot.run_periodic())
+    app.state.loop_lag_task = asyncio.create_task(monitor_loop_lag())
+    app.state.warmup_task = asyncio.create_task(warm_up_in_background())
+    startup_profile.mark("startup_complete")
+
+@app.on_event("shutdown")
+async def stop_offload_pool():
+    app.state.loop_lag_task.cancel()
+    app.state.snapshot_task.cancel()
+    offload.shutdown()
+    # Before the cache is closed, which empties the in-memory backend
+    await snapshot.save()
+    await cache.close()
+    adaptive_timeouts.save()
+    model_stats.save()
+
+# Closed unless DEBUG_ENDPOINTS (and DEBUG_KEY) allow the request, see backend.debug_access
+DEBUG_ONLY = [Depends(require_debug_access)]
+
+@app.get("/debug/startup", dependencies=DEBUG_ONLY)
+def get_startup_profile():
+    """Import timings and milestones of this worker's startup, and the SDK warm-up state"""
+    return {**startup_profile.report(), "warmup": warmup_state, "snapshot": snapshot.last_snapshot}
+
+@app.get("/debug/timeouts", dependencies=DEBUG_ONLY)
+def get_adaptive_timeouts():
+    """Learned MCP timeouts and latency per server and tool"""
+    return {"enabled": adaptive_timeouts.ADAPTIVE_TIMEOUTS, "timeouts": adaptive_timeouts.snapshot()}
+
+@app.get("/debug/prompt-prefixes", dependencies=DEBUG_ONLY)
+def get_prompt_prefixes():
+    """Prompt prefix reuse ratio per LLM stage"""
+    return prompt_prefix.snapshot()
+
+@app.get("/debug/rate-limit", dependencies=DEBUG_ONLY)
+def get_rate_limit():
+    """Rate limit configuration and tracked clients"""
+    return rate_limit.snapshot()
+
+@app.get("/debug/traces", dependencies=DEBUG_ONLY)
+def get_traces():
+    """Recent /chat traces, newest first"""
+    return {"traces": tracing.list_traces()}
+
+@app.get("/debug/traces/{trace_id}", dependencies=DEBUG_ONLY)
+def get_trace(trace_id: str):
+    """Waterfall of a single trace"""
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+@app.get("/debug/memory", dependencies=DEBUG_ONLY)
+def get_memory_profiles():
+    """Recent memory-profiled /chat requests, newest first"""
+    return {
+        "header_enabled": memory_profile.MEMORY_PROFILE_HEADER,
+        "sample_rate": memory_profile.MEMORY_PROFILE_SAMPLE_RATE,
+        "profiles": memory_profile.list_profiles(),
+    }
+
+@app.get("/debug/memory/{trace_id}", dependencies=DEBUG_ONLY)
+def get_memory_profile(trace_id: str):
+    """Peak, retained memory and top allocation sites per stage of one request"""
+    profile = memory_profile.get_profile(trace_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Memory profile not found")
+    return profile
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics: per-stage latency histograms and error counters"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/event-loop", dependencies=DEBUG_ONLY)
+def get_event_loop_stats():
+    """Offload policy, event loop lag and time spent blocking vs offloaded per stage"""
+    return offload.stats()
+
+AUTO_MODEL_ENTRY = {
+    "id": "auto",
+    "name": "Auto (fastest)",
+    "description": "Routes each request to the currently fastest general-purpose model whose context fits the conversation.",
+}
+
 @app.get("/models")
-def get_models():
-    return {"models": AVAILABLE_MODELS}
+def get_models(request: Request):
+    """Available models and their context sizes; live stats are at /models/stats"""
+    content = {"models": model_stats.catalog(AVAILABLE_MODELS) + [AUTO_MODEL_ENTRY]}
+    return conditional_json(request, content, make_etag(content), f"public, max-age={MODELS_MAX_AGE}", "models")
+
+@app.get("/models/stats")
+def get_models_stats(request: Request):
+    """Live latency, speed and error-rate stats per model"""
+    content = {"stats": model_stats.live_stats(AVAILABLE_MODELS)}
+    # Changes with every LLM call: always revalidate, 304 only while no call has finished
+    return conditional_json(request, content, make_etag(content), "no-cache", "models_stats")
 
 @app.get("/mcp-tools")
-async def get_mcp_tools_endpoint(mcp_url: str):
+async def get_mcp_tools_endpoint(mcp_url: str, request: Request, response: Response):
     """Get available tools from an MCP server"""
+    response.headers["Cache-Control"] = "no-store"
     if not mcp_url:
         return {"tools": "No MCP server URL provided"}
     
     try:
-        tools_context = await asyncio.wait_for(get_mcp_tools(mcp_url), timeout=30)
-        return {"tools": tools_context}
+        list_timeout = adaptive_timeouts.timeout_for(mcp_server_label(mcp_url), "list_tools", "list_tools")
+        tools_context = await asyncio.wait_for(get_mcp_tools(mcp_url), timeout=list_timeout)
+        if isinstance(tools_context, str) and tools_context.startswith("Error"):
+            return {"tools": tools_context}
+        # The catalog itself is the version: the ETag changes whenever the server's tools do
+        return conditional_json(request, {"tools": tools_context}, make_etag(mcp_url, tools_context),
+                                f"public, max-age={MCP_TOOLS_MAX_AGE}", "mcp_tools")
     except asyncio.TimeoutError:
         return {"tools": "Error: MCP server did not respond in time."}
     except Exception as e:
@@ -885,11 +1322,45 @@ async def fix_layout(request: Request):
     if not text.strip():
         return {"fixed_text": text}
 
-    detected = detect_charset(text)
-    if lang != detected and (detected, lang) in LAYOUTS:
-        fixed = fix_keyboard_layout(text, detected, lang)
-        return {"fixed_text": fixed}
-    return {"fixed_text": text}
+    # Skip pointless conversions: no letters, mixed scripts, text already valid for lang, identity mapping
+    detected = pick_layout_source(charset_scores(text), lang, LAYOUT_MIN_CONFIDENCE)
+    if not detected or not changes_text(text, detected, lang):
+        return {"fixed_text": text}
+    fixed = fix_keyboard_layout(text, detected, lang)
+    return {"fixed_text": fixed}
+
+@app.websocket("/ws/fix-layout")
+async def fix_layout_ws(websocket: WebSocket):
+    """As-you-type layout detection: the client sends {"text", "lang"} (or {"append"}) on every change,
+    the server pushes a suggestion once it is confident the text was typed in the wrong layout."""
+    await websocket.accept()
+    detector = IncrementalLayoutDetector(LAYOUT_SUGGEST_CONFIDENCE, LAYOUT_SUGGEST_MIN_LETTERS)
+    last_sent = None
+    try:
+        while True:
+            data = await websocket.receive_json()
+            lang = data.get("lang", "en")
+            if "append" in data:
+                text = detector.text + data["append"]
+            else:
+                text = data.get("text", "")
+            detector.update(text)
+
+            suggestion = detector.suggest(lang)
+            message = None
+            if suggestion:
+                from_lang, confidence, fixed = suggestion
+                message = {"type": "suggestion", "text": text, "fixed_text": fixed, "from": from_lang, "to": lang, "confidence": round(confidence, 3)}
+            elif last_sent:
+                message = {"type": "clear"}
+            # Only push when the suggestion changes
+            if message and message != last_sent:
+                await websocket.send_json(message)
+            last_sent = message if suggestion else None
+    except WebSocketDisconnect:
+        pass
+
+startup_profile.mark("main_imported")
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
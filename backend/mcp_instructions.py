@@ -1,6 +1,18 @@
 """
 MCP Server Instructions
 Separate instructions for each MCP server to optimize tool usage and response quality.
+
+Instructions are assembled in layers, most stable first: the static rules of
+the server, then its tool catalog (tagged with a content version), then the
+per-request language line. Requests to the same server share a byte-identical
+prefix, which provider-side prefix caching can reuse.
+"""
+
+import hashlib
+
+# Rules for answering from a tool result, shared by all final instructions
+TOOL_RESULT_RULES = """When the conversation ends with a tool result, base your answer on that result and answer the user's original question.
+IMPORTANT: If the tool result contains any URLs or links, you MUST include them in your response. Format all links as [Description](URL) with descriptive text. Do not just mention that links exist - actually include them in your response.
 """
 
 # Base language instruction template
@@ -8,14 +20,27 @@ def get_lang_instruction(lang_code: str) -> str:
     """Get language instruction based on language code."""
     return f"RESPOND ONLY IN {lang_code.upper()}. Do not use any other languages."
 
-# CoinGecko MCP Server Instructions
-def get_coingecko_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def catalog_version(tools_context) -> str:
+    """Short content hash of a tool catalog; changes whenever the server's tools do."""
+    return hashlib.sha256(str(tools_context).encode("utf-8")).hexdigest()[:12]
 
-Available tools: {tools_context}
+def instruction_layers(rules: str, lang_code: str, tools_context=None) -> list:
+    """(layer, text) pairs for tool selection: rules, versioned catalog, language line."""
+    layers = [("rules", rules)]
+    if tools_context is not None:
+        layers.append(("catalog", f"Available tools (catalog {catalog_version(tools_context)}):\n{tools_context}\n"))
+    layers.append(("request", get_lang_instruction(lang_code) + "\n"))
+    return layers
 
-USE COINGECKO TOOLS ONLY for:
+def final_instruction_layers(rules: str, lang_code: str) -> list:
+    """(layer, text) pairs for the final answer: rules, tool result rules, language line."""
+    return [("rules", rules + "\n" + TOOL_RESULT_RULES), ("request", get_lang_instruction(lang_code) + "\n")]
+
+def join_layers(layers: list) -> str:
+    return "\n".join(text for _, text in layers)
+
+# CoinGecko MCP Server Instructions
+COINGECKO_RULES = """USE COINGECKO TOOLS ONLY for:
 - Cryptocurrency prices, market data, trading information
 - Coin market cap, volume, price changes
 - Crypto rankings, trends, market analysis
@@ -26,26 +51,20 @@ DO NOT USE for:
 - Questions about yourself, opinions, creative writing
 
 WHEN USING TOOLS:
-- Respond ONLY with: {{"tool_call": {{"tool": "<tool_name>", "params": {{<params>}}}}}}
+- Respond ONLY with: {"tool_call": {"tool": "<tool_name>", "params": {<params>}}}
 - Use standard coin IDs: "bitcoin", "ethereum", "binancecoin", "cardano", "solana"
 - Specify currency: "usd", "eur", "btc", "eth"
 - Provide ALL required parameters
-- ONLY use tools that are actually available in the tools list above
-
-
+- ONLY use tools that are actually available in the tools list below
 
 For general conversation, respond naturally without tools.
 """
 
-# Fetch MCP Server Instructions
-def get_fetch_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
-
-
-Available tools: {tools_context}
+def get_coingecko_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(COINGECKO_RULES, lang_code, tools_context))
 
-USE FETCH TOOLS ONLY for:
+# Fetch MCP Server Instructions
+FETCH_RULES = """USE FETCH TOOLS ONLY for:
 - Current information from websites
 - Real-time data, news, live content
 - Web page content, articles, online resources
@@ -56,20 +75,18 @@ DO NOT USE for:
 - General conversation, greetings
 
 WHEN USING TOOLS:
-- Respond ONLY with: {{"tool_call": {{"tool": "fetch", "params": {{"url": "<url>"}}}}}}
+- Respond ONLY with: {"tool_call": {"tool": "fetch", "params": {"url": "<url>"}}}
 - Ensure URL is complete and accessible
 - Only fetch from reputable websites
 
 For general conversation, respond naturally without tools.
 """
 
-# Sequential Thinking MCP Server Instructions
-def get_sequential_thinking_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_fetch_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(FETCH_RULES, lang_code, tools_context))
 
-You have access to advanced problem-solving tools:
-{tools_context}
+# Sequential Thinking MCP Server Instructions
+SEQUENTIAL_THINKING_RULES = """You have access to advanced problem-solving tools, listed under "Available tools" below.
 
 IMPORTANT INSTRUCTIONS FOR SEQUENTIAL THINKING TOOL USAGE:
 
@@ -86,7 +103,7 @@ IMPORTANT INSTRUCTIONS FOR SEQUENTIAL THINKING TOOL USAGE:
    - Basic information requests
 
 3. When using Sequential Thinking tools:
-   - Respond ONLY with JSON: {{"tool_call": {{"tool": "sequential_thinking", "params": {{"problem": "<problem_description>"}}}}}}
+   - Respond ONLY with JSON: {"tool_call": {"tool": "sequential_thinking", "params": {"problem": "<problem_description>"}}}
    - Clearly describe the problem or question to be analyzed
    - Focus on complex problems that benefit from structured thinking
 
@@ -95,13 +112,11 @@ IMPORTANT INSTRUCTIONS FOR SEQUENTIAL THINKING TOOL USAGE:
 5. If no complex problem-solving is needed, respond conversationally to the user's question.
 """
 
-# DeepWiki MCP Server Instructions
-def get_deepwiki_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_sequential_thinking_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(SEQUENTIAL_THINKING_RULES, lang_code, tools_context))
 
-You have access to DeepWiki research and documentation tools:
-{tools_context}
+# DeepWiki MCP Server Instructions
+DEEPWIKI_RULES = """You have access to DeepWiki research and documentation tools, listed under "Available tools" below.
 
 IMPORTANT INSTRUCTIONS FOR DEEPWIKI TOOL USAGE:
 
@@ -119,7 +134,7 @@ IMPORTANT INSTRUCTIONS FOR DEEPWIKI TOOL USAGE:
    - Simple questions that don't require research
 
 3. When using DeepWiki tools:
-   - Respond ONLY with JSON: {{"tool_call": {{"tool": "<tool_name>", "params": {{<params>}}}}}}
+   - Respond ONLY with JSON: {"tool_call": {"tool": "<tool_name>", "params": {<params>}}}
    - Provide specific search terms or research topics
    - Focus on technical, academic, or project-related queries
    - Use precise keywords for better search results
@@ -129,13 +144,11 @@ IMPORTANT INSTRUCTIONS FOR DEEPWIKI TOOL USAGE:
 5. If no research is needed, respond conversationally to the user's question.
 """
 
-# Cloudflare Docs MCP Server Instructions
-def get_cloudflare_docs_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_deepwiki_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(DEEPWIKI_RULES, lang_code, tools_context))
 
-You have access to Cloudflare documentation and developer resources:
-{tools_context}
+# Cloudflare Docs MCP Server Instructions
+CLOUDFLARE_DOCS_RULES = """You have access to Cloudflare documentation and developer resources, listed under "Available tools" below.
 
 IMPORTANT INSTRUCTIONS FOR CLOUDFLARE DOCS TOOL USAGE:
 
@@ -153,7 +166,7 @@ IMPORTANT INSTRUCTIONS FOR CLOUDFLARE DOCS TOOL USAGE:
    - Questions about yourself or general knowledge
 
 3. When using Cloudflare Docs tools:
-   - Respond ONLY with JSON: {{"tool_call": {{"tool": "<tool_name>", "params": {{<params>}}}}}}
+   - Respond ONLY with JSON: {"tool_call": {"tool": "<tool_name>", "params": {<params>}}}
    - Search for specific Cloudflare features or documentation
    - Focus on technical implementation and configuration
    - Use precise technical terms for better results
@@ -163,13 +176,11 @@ IMPORTANT INSTRUCTIONS FOR CLOUDFLARE DOCS TOOL USAGE:
 5. If no Cloudflare-specific information is needed, respond conversationally.
 """
 
-# Semgrep MCP Server Instructions
-def get_semgrep_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_cloudflare_docs_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(CLOUDFLARE_DOCS_RULES, lang_code, tools_context))
 
-You have access to Semgrep code analysis and security tools:
-{tools_context}
+# Semgrep MCP Server Instructions
+SEMGREP_RULES = """You have access to Semgrep code analysis and security tools, listed under "Available tools" below.
 
 IMPORTANT INSTRUCTIONS FOR SEMGREP TOOL USAGE:
 
@@ -187,7 +198,7 @@ IMPORTANT INSTRUCTIONS FOR SEMGREP TOOL USAGE:
    - Questions about yourself or general knowledge
 
 3. When using Semgrep tools:
-   - Respond ONLY with JSON: {{"tool_call": {{"tool": "<tool_name>", "params": {{<params>}}}}}}
+   - Respond ONLY with JSON: {"tool_call": {"tool": "<tool_name>", "params": {<params>}}}
    - Focus on code analysis, security rules, or programming languages
    - Use specific programming language or security terminology
    - Provide clear analysis requests or rule queries
@@ -197,13 +208,11 @@ IMPORTANT INSTRUCTIONS FOR SEMGREP TOOL USAGE:
 5. If no code analysis is needed, respond conversationally to the user's question.
 """
 
-# GitMCP Docs MCP Server Instructions
-def get_gitmcp_docs_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_semgrep_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(SEMGREP_RULES, lang_code, tools_context))
 
-You have access to GitHub documentation and repository tools:
-{tools_context}
+# GitMCP Docs MCP Server Instructions
+GITMCP_DOCS_RULES = """You have access to GitHub documentation and repository tools, listed under "Available tools" below.
 
 IMPORTANT INSTRUCTIONS FOR GITMCP DOCS TOOL USAGE:
 
@@ -221,7 +230,7 @@ IMPORTANT INSTRUCTIONS FOR GITMCP DOCS TOOL USAGE:
    - Questions about yourself or general knowledge
 
 3. When using GitMCP Docs tools:
-   - Respond ONLY with JSON: {{"tool_call": {{"tool": "<tool_name>", "params": {{<params>}}}}}}
+   - Respond ONLY with JSON: {"tool_call": {"tool": "<tool_name>", "params": {<params>}}}
    - Provide complete repository URLs in format: owner/repo
    - Focus on documentation, README, or repository structure
    - Use specific repository names or documentation topics
@@ -231,49 +240,21 @@ IMPORTANT INSTRUCTIONS FOR GITMCP DOCS TOOL USAGE:
 5. If no GitHub documentation is needed, respond conversationally to the user's question.
 """
 
-# Default instructions for unknown MCP servers
-def get_default_instructions(lang_code: str, tools_context: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_gitmcp_docs_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(GITMCP_DOCS_RULES, lang_code, tools_context))
 
-Respond naturally.
+# Default instructions for unknown MCP servers
+DEFAULT_RULES = """Respond naturally.
 When ANY user asks about "io.net", "IO Intelligence", "How are you use io.net", "your capabilities", "how you work", or similar questions, you respond with:
 "I use IO Intelligence (io.net) for AI model inference. I can access multiple AI models through the IO Intelligence SDK, including DeepSeek-R1, Llama-4-Maverick, Qwen3-235B, Gemma-3-27b, and others. I can also use MCP servers for external data and tools. I am an assistant that uses IO Intelligence for inference and external data access."
 NEVER say you don't use io.net directly, don't have access, or are just a language model. ALWAYS present yourself as using IO Intelligence.
 """
 
-# Function to get appropriate instructions based on MCP server
-def get_mcp_instructions(mcp_url: str, lang_code: str, tools_context: str) -> str:
-    """Get specific instructions based on MCP server URL."""
-    
-    if not mcp_url:
-        return get_default_instructions(lang_code, tools_context)
-    
-    mcp_url_lower = mcp_url.lower()
-    
-    if "coingecko" in mcp_url_lower:
-        return get_coingecko_instructions(lang_code, tools_context)
-    elif "fetch" in mcp_url_lower:
-        return get_fetch_instructions(lang_code, tools_context)
-    elif "sequentialthinking" in mcp_url_lower or "sequential_thinking" in mcp_url_lower:
-        return get_sequential_thinking_instructions(lang_code, tools_context)
-    elif "deepwiki" in mcp_url_lower:
-        return get_deepwiki_instructions(lang_code, tools_context)
-    elif "cloudflare" in mcp_url_lower:
-        return get_cloudflare_docs_instructions(lang_code, tools_context)
-    elif "semgrep" in mcp_url_lower:
-        return get_semgrep_instructions(lang_code, tools_context)
-    elif "gitmcp" in mcp_url_lower:
-        return get_gitmcp_docs_instructions(lang_code, tools_context)
-    else:
-        return get_default_instructions(lang_code, tools_context)
+def get_default_instructions(lang_code: str, tools_context: str) -> str:
+    return join_layers(instruction_layers(DEFAULT_RULES, lang_code))
 
 # Final answer instructions for each MCP server
-def get_coingecko_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
-
-Provide clear, user-friendly, and visually formatted answers about cryptocurrency data.
+COINGECKO_FINAL_RULES = """Provide clear, user-friendly, and visually formatted answers about cryptocurrency data.
 
 IMPORTANT:
 - You MUST provide a final, natural language answer to the user.
@@ -296,11 +277,10 @@ IMPORTANT:
 - If the data is missing, say so clearly and suggest what the user can try next.
 """
 
-def get_fetch_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_coingecko_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(COINGECKO_FINAL_RULES, lang_code))
 
-When ANY user asks about "io.net", "IO Intelligence", "How are use io.net", "your capabilities", "how you work", or similar questions, you MUST respond with:
+FETCH_FINAL_RULES = """When ANY user asks about "io.net", "IO Intelligence", "How are use io.net", "your capabilities", "how you work", or similar questions, you MUST respond with:
 "I use IO Intelligence (io.net) for AI model inference. I can access multiple AI models through the IO Intelligence SDK, including DeepSeek-R1, Llama-4-Maverick, Qwen3-235B, Gemma-3-27b, and others. I can also use MCP servers for external data and tools. I am an assistant that uses IO Intelligence for inference and external data access."
 
 NEVER say you don't use io.net directly, don't have access, or are just a language model. ALWAYS present yourself as using IO Intelligence.
@@ -318,11 +298,10 @@ FORMAT:
 - Include source links for news and events
 """
 
-def get_sequential_thinking_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_fetch_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(FETCH_FINAL_RULES, lang_code))
 
-Provide clear, natural language answers with structured problem-solving.
+SEQUENTIAL_THINKING_FINAL_RULES = """Provide clear, natural language answers with structured problem-solving.
 
 RESPONSE FORMAT INSTRUCTIONS:
 When providing final answers with structured thinking:
@@ -348,11 +327,10 @@ When providing final answers with structured thinking:
 - When presenting complex solutions, break them down into digestible sections
 """
 
-def get_deepwiki_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_sequential_thinking_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(SEQUENTIAL_THINKING_FINAL_RULES, lang_code))
 
-Provide clear, natural language answers about research and documentation.
+DEEPWIKI_FINAL_RULES = """Provide clear, natural language answers about research and documentation.
 
 RESPONSE FORMAT INSTRUCTIONS:
 When providing final answers about research and documentation:
@@ -380,11 +358,10 @@ When providing final answers about research and documentation:
 - When discussing projects, repositories, or documentation, and if the project has DeepWiki documentation available, include the DeepWiki link in format: [DeepWiki Documentation](https://deepwiki.com/owner/repo)
 """
 
-def get_cloudflare_docs_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_deepwiki_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(DEEPWIKI_FINAL_RULES, lang_code))
 
-Provide clear, natural language answers about Cloudflare services and web development.
+CLOUDFLARE_DOCS_FINAL_RULES = """Provide clear, natural language answers about Cloudflare services and web development.
 
 RESPONSE FORMAT INSTRUCTIONS:
 When providing final answers about Cloudflare and web development:
@@ -412,11 +389,10 @@ When providing final answers about Cloudflare and web development:
 - When discussing Cloudflare implementation, include code examples and configuration details
 """
 
-def get_semgrep_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_cloudflare_docs_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(CLOUDFLARE_DOCS_FINAL_RULES, lang_code))
 
-Provide clear, natural language answers about code analysis and security.
+SEMGREP_FINAL_RULES = """Provide clear, natural language answers about code analysis and security.
 
 RESPONSE FORMAT INSTRUCTIONS:
 When providing final answers about code analysis and security:
@@ -444,11 +420,10 @@ When providing final answers about code analysis and security:
 - When discussing security vulnerabilities, include severity levels and remediation steps
 """
 
-def get_gitmcp_docs_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_semgrep_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(SEMGREP_FINAL_RULES, lang_code))
 
-Provide clear, natural language answers about GitHub repositories and documentation.
+GITMCP_DOCS_FINAL_RULES = """Provide clear, natural language answers about GitHub repositories and documentation.
 
 RESPONSE FORMAT INSTRUCTIONS:
 When providing final answers about GitHub repositories and documentation:
@@ -476,11 +451,10 @@ When providing final answers about GitHub repositories and documentation:
 - When discussing projects, repositories, or documentation, and if the project has DeepWiki documentation available, include the DeepWiki link in format: [DeepWiki Documentation](https://deepwiki.com/owner/repo)
 """
 
-def get_default_final_instructions(lang_code: str) -> str:
-    lang_instruction = get_lang_instruction(lang_code)
-    return f"""{lang_instruction}
+def get_gitmcp_docs_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(GITMCP_DOCS_FINAL_RULES, lang_code))
 
-When ANY user asks about "io.net", "IO Intelligence", "How are use io.net", "your capabilities", "how you work", or similar questions, you MUST respond with:
+DEFAULT_FINAL_RULES = """When ANY user asks about "io.net", "IO Intelligence", "How are use io.net", "your capabilities", "how you work", or similar questions, you MUST respond with:
 "I use IO Intelligence (io.net) for AI model inference. I can access multiple AI models through the IO Intelligence SDK, including DeepSeek-R1, Llama-4-Maverick, Qwen3-235B, Gemma-3-27b, and others. I can also use MCP servers for external data and tools. I am an assistant that uses IO Intelligence for inference and external data access."
 
 NEVER say you don't use io.net directly, don't have access, or are just a language model. ALWAYS present yourself as using IO Intelligence.
@@ -513,28 +487,63 @@ When providing final answers to users:
 - If you see a number that looks like a UNIX timestamp (e.g., 10 or more digits, likely in seconds since 1970), always convert it to a human-readable date in your response
 """
 
-# Function to get appropriate final instructions based on MCP server
-def get_mcp_final_instructions(mcp_url: str, lang_code: str) -> str:
-    """Get specific final instructions based on MCP server URL."""
-    
+def get_default_final_instructions(lang_code: str) -> str:
+    return join_layers(final_instruction_layers(DEFAULT_FINAL_RULES, lang_code))
+
+def server_kind(mcp_url: str) -> str:
+    """Which instruction set an MCP server URL gets."""
     if not mcp_url:
-        return get_default_final_instructions(lang_code)
+        return "default"
     
     mcp_url_lower = mcp_url.lower()
     
     if "coingecko" in mcp_url_lower:
-        return get_coingecko_final_instructions(lang_code)
+        return "coingecko"
     elif "fetch" in mcp_url_lower:
-        return get_fetch_final_instructions(lang_code)
+        return "fetch"
     elif "sequentialthinking" in mcp_url_lower or "sequential_thinking" in mcp_url_lower:
-        return get_sequential_thinking_final_instructions(lang_code)
+        return "sequential_thinking"
     elif "deepwiki" in mcp_url_lower:
-        return get_deepwiki_final_instructions(lang_code)
+        return "deepwiki"
     elif "cloudflare" in mcp_url_lower:
-        return get_cloudflare_docs_final_instructions(lang_code)
+        return "cloudflare_docs"
     elif "semgrep" in mcp_url_lower:
-        return get_semgrep_final_instructions(lang_code)
+        return "semgrep"
     elif "gitmcp" in mcp_url_lower:
-        return get_gitmcp_docs_final_instructions(lang_code)
+        return "gitmcp_docs"
     else:
-        return get_default_final_instructions(lang_code) 
\ No newline at end of file
+        return "default"
+
+# (tool selection rules, final answer rules) per server kind
+SERVER_RULES = {
+    "coingecko": (COINGECKO_RULES, COINGECKO_FINAL_RULES),
+    "fetch": (FETCH_RULES, FETCH_FINAL_RULES),
+    "sequential_thinking": (SEQUENTIAL_THINKING_RULES, SEQUENTIAL_THINKING_FINAL_RULES),
+    "deepwiki": (DEEPWIKI_RULES, DEEPWIKI_FINAL_RULES),
+    "cloudflare_docs": (CLOUDFLARE_DOCS_RULES, CLOUDFLARE_DOCS_FINAL_RULES),
+    "semgrep": (SEMGREP_RULES, SEMGREP_FINAL_RULES),
+    "gitmcp_docs": (GITMCP_DOCS_RULES, GITMCP_DOCS_FINAL_RULES),
+    "default": (DEFAULT_RULES, DEFAULT_FINAL_RULES),
+}
+
+def get_mcp_instruction_layers(mcp_url: str, lang_code: str, tools_context) -> list:
+    """Tool selection instructions for an MCP server as (layer, text) pairs."""
+    kind = server_kind(mcp_url)
+    if kind == "default":
+        # Unknown servers and LLM-only requests get no catalog
+        return instruction_layers(DEFAULT_RULES, lang_code)
+    return instruction_layers(SERVER_RULES[kind][0], lang_code, tools_context)
+
+# Function to get appropriate instructions based on MCP server
+def get_mcp_instructions(mcp_url: str, lang_code: str, tools_context: str) -> str:
+    """Get specific instructions based on MCP server URL."""
+    return join_layers(get_mcp_instruction_layers(mcp_url, lang_code, tools_context))
+
+def get_mcp_final_instruction_layers(mcp_url: str, lang_code: str) -> list:
+    """Final answer instructions for an MCP server as (layer, text) pairs."""
+    return final_instruction_layers(SERVER_RULES[server_kind(mcp_url)][1], lang_code)
+
+# Function to get appropriate final instructions based on MCP server
+def get_mcp_final_instructions(mcp_url: str, lang_code: str) -> str:
+    """Get specific final instructions based on MCP server URL."""
+    return join_layers(get_mcp_final_instruction_layers(mcp_url, lang_code))
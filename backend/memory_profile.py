@@ -0,0 +1,168 @@
+"""
+Per-request memory profiling with tracemalloc.
+Opt-in, per /chat request: sent with the X-Memory-Profile header (when
+MEMORY_PROFILE_HEADER=1 and the request may use /debug/*, see debug_access) or
+picked by MEMORY_PROFILE_SAMPLE_RATE. While a request is profiled, every
+tracing span is a stage: its peak above the memory at stage start, what it
+still holds at the end, and the source lines with the largest net allocations
+over the stage. Results are kept for /debug/memory.
+
+tracemalloc is process-wide and slows allocations down, so one request is
+profiled at a time; allocations of requests running concurrently are counted
+too.
+"""
+
+import linecache
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from . import debug_access
+
+# Honor the X-Memory-Profile request header (from requests allowed to use /debug/*)
+MEMORY_PROFILE_HEADER = os.getenv("MEMORY_PROFILE_HEADER", "0") == "1"
+# Share of /chat requests profiled without the header
+MEMORY_PROFILE_SAMPLE_RATE = float(os.getenv("MEMORY_PROFILE_SAMPLE_RATE", "0"))
+# Allocation sites reported per stage
+MEMORY_PROFILE_TOP = int(os.getenv("MEMORY_PROFILE_TOP", "5"))
+# Profiles kept for /debug/memory
+MEMORY_PROFILE_BUFFER = 50
+HEADER = "x-memory-profile"
+
+_active = ContextVar("memory_profile", default=None)
+_busy = threading.Lock()
+_profiles = OrderedDict()
+_lock = threading.Lock()
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+def _kb(size: int) -> float:
+    return round(size / 1024, 1)
+
+
+class RequestProfile:
+    def __init__(self, trace_id: str, reason: str):
+        self.trace_id = trace_id
+        self.reason = reason
+        self.started = time.time()
+        self.stages = []
+        self.peak = 0
+        self._open = []
+        # Spans of run_cpu jobs enter from worker threads
+        self._lock = threading.Lock()
+
+    def _fold_peak(self):
+        """Credit the peak since the last reset to every open stage, then start a new interval."""
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        for stage in self._open:
+            stage["peak"] = max(stage["peak"], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self, name: str) -> dict:
+        with self._lock:
+            self._fold_peak()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+            # Measured after the snapshot so the stage is not charged for it
+            current = self._fold_peak()
+            stage = {"name": name, "depth": len(self._open), "start": current, "peak": current, "snapshot": snapshot}
+            self._open.append(stage)
+            return stage
+
+    def exit(self, stage: dict) -> dict:
+        with self._lock:
+            current = self._fold_peak()
+            self._open.remove(stage)
+            diff = tracemalloc.take_snapshot().filter_traces(_FILTERS).compare_to(stage.pop("snapshot"), "lineno")
+            self._fold_peak()
+        result = {
+            "stage": stage["name"],
+            "depth": stage["depth"],
+            "peak_kb": _kb(stage["peak"] - stage["start"]),
+            "retained_kb": _kb(current - stage["start"]),
+            "sites": [
+                {"site": str(entry.traceback), "size_kb": _kb(entry.size_diff), "count": entry.count_diff}
+                for entry in diff[:MEMORY_PROFILE_TOP] if entry.size_diff > 0
+            ],
+        }
+        self.stages.append(result)
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "reason": self.reason,
+            "started": self.started,
+            "peak_kb": _kb(self.peak),
+            "stages": self.stages,
+        }
+
+
+def active():
+    """Profile of the current request, or None."""
+    return _active.get()
+
+
+def _reason(headers) -> str:
+    if MEMORY_PROFILE_HEADER and headers.get(HEADER, "").lower() in ("1", "true", "yes") \
+            and debug_access.allowed(headers):
+        return "header"
+    if MEMORY_PROFILE_SAMPLE_RATE > 0 and random.random() < MEMORY_PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+@contextmanager
+def profile_request(trace_id: str, headers):
+    """Profile the with-block when the request asks for it or is sampled."""
+    reason = _reason(headers)
+    if reason is None or tracemalloc.is_tracing() or not _busy.acquire(blocking=False):
+        yield None
+        return
+    tracemalloc.start()
+    profile = RequestProfile(trace_id, reason)
+    token = _active.set(profile)
+    whole = profile.enter("request")
+    try:
+        yield profile
+    finally:
+        profile.exit(whole)
+        _active.reset(token)
+        tracemalloc.stop()
+        _busy.release()
+        with _lock:
+            _profiles[trace_id] = profile.to_dict()
+            while len(_profiles) > MEMORY_PROFILE_BUFFER:
+                _profiles.popitem(last=False)
+
+
+def list_profiles() -> list:
+    """Profiled requests, newest first, with their peak and heaviest stage."""
+    with _lock:
+        profiles = list(_profiles.values())
+    summaries = []
+    for profile in reversed(profiles):
+        heaviest = max(profile["stages"], key=lambda s: s["peak_kb"], default=None)
+        summaries.append({
+            "trace_id": profile["trace_id"],
+            "reason": profile["reason"],
+            "started": profile["started"],
+            "peak_kb": profile["peak_kb"],
+            "heaviest_stage": heaviest and {"stage": heaviest["stage"], "peak_kb": heaviest["peak_kb"]},
+        })
+    return summaries
+
+
+def get_profile(trace_id: str):
+    with _lock:
+        return _profiles.get(trace_id)
@@ -0,0 +1,135 @@
+"""
+In-process metrics registry.
+Counters and latency histograms keyed by metric name and labels, exported in
+the Prometheus text format by /metrics.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name: str, text: str):
+    """Set the HELP text of a metric."""
+    _help[name] = text
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increment a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, value: float, **labels):
+    """Record a value (usually a duration in seconds) in a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(DEFAULT_BUCKETS), "count": 0, "sum": 0.0, "max": 0.0}
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+                break
+        histogram["count"] += 1
+        histogram["sum"] += value
+        histogram["max"] = max(histogram["max"], value)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the with-block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def quantile(name: str, q: float, **labels):
+    """Estimate a quantile of a histogram from its buckets (upper bound of the bucket it falls in)."""
+    with _lock:
+        histogram = _histograms.get(_key(name, labels))
+        if not histogram or not histogram["count"]:
+            return None
+        rank = q * histogram["count"]
+        seen = 0
+        for bound, count in zip(DEFAULT_BUCKETS, histogram["buckets"]):
+            seen += count
+            if seen >= rank:
+                return bound
+        return histogram["max"]
+
+
+def snapshot() -> dict:
+    """Return all metrics as plain dicts."""
+    with _lock:
+        counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in _counters.items()]
+        histograms = [
+            {"name": n, "labels": dict(l), "count": h["count"], "sum": h["sum"], "max": h["max"]}
+            for (n, l), h in _histograms.items()
+        ]
+    return {"counters": counters, "histograms": histograms}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, dict(v, buckets=list(v["buckets"]))) for k, v in _histograms.items())
+
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for (name, labels), histogram in histograms:
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(DEFAULT_BUCKETS, histogram["buckets"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
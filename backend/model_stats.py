@@ -0,0 +1,237 @@
+"""
+Live model performance stats.
+Records latency, output speed and errors of every LLM call per model in
+rolling windows, persists them to a JSON file, and picks the fastest model
+that fits a prompt for the "auto" pseudo-model.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from .latency import LatencyWindow
+from .relevance import estimate_tokens
+
+MODEL_STATS_WINDOW = int(os.getenv("MODEL_STATS_WINDOW", "200"))
+# Stats file; empty disables persistence
+MODEL_STATS_FILE = os.getenv("MODEL_STATS_FILE", "model-stats.json")
+# Samples a model needs before "auto" trusts its stats
+MODEL_STATS_MIN_SAMPLES = int(os.getenv("MODEL_STATS_MIN_SAMPLES", "5"))
+# Share of "auto" requests sent to the least-measured candidate so its stats stay current
+AUTO_EXPLORE_RATIO = float(os.getenv("AUTO_EXPLORE_RATIO", "0.05"))
+# Tokens kept free for the answer when checking that a prompt fits
+MODEL_OUTPUT_RESERVE = 2048
+SAVE_EVERY = 20
+STATS_VERSION = 1
+
+AUTO_MODELS = ("auto", "fastest")
+
+# Context windows in tokens (as served); unknown models get DEFAULT_CONTEXT_TOKENS.
+# Also the models stats are kept for (the AVAILABLE_MODELS ids)
+MODEL_CONTEXT_TOKENS = {
+    "deepseek-ai/DeepSeek-R1-0528": 128000,
+    "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8": 128000,
+    "Qwen/Qwen3-235B-A22B-FP8": 32768,
+    "google/gemma-3-27b-it": 128000,
+    "meta-llama/Llama-3.3-70B-Instruct": 128000,
+    "mistralai/Devstral-Small-2505": 128000,
+    "mistralai/Magistral-Small-2506": 40000,
+    "deepseek-ai/DeepSeek-R1": 128000,
+    "deepseek-ai/DeepSeek-R1-Distill-Llama-70B": 128000,
+    "netease-youdao/Confucius-o1-14B": 32768,
+    "nvidia/AceMath-7B-Instruct": 4096,
+    "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B": 128000,
+    "mistralai/Mistral-Large-Instruct-2411": 128000,
+    "microsoft/phi-4": 16384,
+    "bespokelabs/Bespoke-Stratos-32B": 32768,
+    "THUDM/glm-4-9b-chat": 128000,
+    "CohereForAI/aya-expanse-32b": 128000,
+    "openbmb/MiniCPM3-4B": 32768,
+    "mistralai/Ministral-8B-Instruct-2410": 128000,
+    "ibm-granite/granite-3.1-8b-instruct": 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 32768
+
+
+class ModelStats:
+    def __init__(self, size: int = MODEL_STATS_WINDOW):
+        self.latency = LatencyWindow(size)
+        self.tokens_per_second = LatencyWindow(size)
+        self.outcomes = deque(maxlen=size)
+
+    def summary(self) -> dict:
+        outcomes = list(self.outcomes)
+
+        def rounded(value, digits=3):
+            return round(value, digits) if value is not None else None
+
+        return {
+            "samples": len(outcomes),
+            "latency_p50_s": rounded(self.latency.percentile(0.5)),
+            "latency_p95_s": rounded(self.latency.percentile(0.95)),
+            "output_tokens_per_s": rounded(self.tokens_per_second.percentile(0.5), 1),
+            "error_rate": rounded(outcomes.count(False) / len(outcomes)) if outcomes else None,
+            "updated": self.latency.updated,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "latency": self.latency.to_dict(),
+            "tokens_per_second": self.tokens_per_second.to_dict(),
+            "outcomes": list(self.outcomes),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, size: int = MODEL_STATS_WINDOW):
+        stats = cls(size)
+        stats.latency = LatencyWindow.from_dict(data.get("latency", {}), size)
+        stats.tokens_per_second = LatencyWindow.from_dict(data.get("tokens_per_second", {}), size)
+        stats.outcomes.extend(data.get("outcomes", [])[-size:])
+        return stats
+
+
+_stats = {}
+_lock = threading.Lock()
+_records = 0
+
+
+def stats_for(model: str):
+    """Stats of a model we serve, created on first use; None for other names (req.model is client input)."""
+    if model not in MODEL_CONTEXT_TOKENS:
+        return None
+    with _lock:
+        stats = _stats.get(model)
+        if stats is None:
+            stats = _stats[model] = ModelStats()
+        return stats
+
+
+def summary(model: str) -> dict:
+    """Stats of a model, without starting to track it."""
+    with _lock:
+        stats = _stats.get(model)
+    return (stats or ModelStats(1)).summary()
+
+
+def latency_window(model: str) -> LatencyWindow:
+    stats = stats_for(model)
+    return stats.latency if stats else LatencyWindow(1)
+
+
+def _recorded():
+    global _records
+    _records += 1
+    if MODEL_STATS_FILE and _records % SAVE_EVERY == 0:
+        save()
+
+
+def record_success(model: str, seconds: float, output_text: str):
+    stats = stats_for(model)
+    if stats is None:
+        return
+    stats.latency.add(seconds)
+    if seconds > 0:
+        stats.tokens_per_second.add(estimate_tokens(output_text) / seconds)
+    stats.outcomes.append(True)
+    _recorded()
+
+
+def record_error(model: str, seconds: float):
+    stats = stats_for(model)
+    if stats is None:
+        return
+    stats.latency.add(seconds)
+    stats.outcomes.append(False)
+    _recorded()
+
+
+def record_cancelled(model: str, seconds: float):
+    """A call cancelled after seconds: a lower bound of its latency, neither success nor error."""
+    stats = stats_for(model)
+    if stats is not None:
+        stats.latency.add(seconds)
+
+
+def context_tokens(model: str) -> int:
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def catalog(models: list) -> list:
+    """AVAILABLE_MODELS entries with their context size; static, so it can be cached."""
+    return [{**model, "context_tokens": context_tokens(model["id"])} for model in models]
+
+
+def live_stats(models: list) -> dict:
+    """Live stats per model id; these change with every LLM call."""
+    return {model["id"]: summary(model["id"]) for model in models}
+
+
+def pick_model(candidates: list, prompt_tokens: int, default: str) -> str:
+    """Fastest candidate (median latency, penalised by error rate) whose context fits the prompt."""
+    needed = prompt_tokens + MODEL_OUTPUT_RESERVE
+    fitting = [m for m in candidates if context_tokens(m) >= needed]
+    if not fitting:
+        return max(candidates, key=context_tokens) if candidates else default
+
+    measured = []
+    for model in fitting:
+        stats = summary(model)
+        if stats["samples"] >= MODEL_STATS_MIN_SAMPLES and stats["latency_p50_s"] is not None:
+            measured.append((stats["latency_p50_s"] * (1 + 4 * stats["error_rate"]), model))
+    unmeasured = [m for m in fitting if m not in {model for _, model in measured}]
+    if unmeasured and (not measured or random.random() < AUTO_EXPLORE_RATIO):
+        return default if default in unmeasured else min(unmeasured, key=lambda m: summary(m)["samples"])
+    return min(measured)[1]
+
+
+def export_state() -> dict:
+    with _lock:
+        return {"version": STATS_VERSION, "saved": time.time(),
+                "models": {model: stats.to_dict() for model, stats in _stats.items()}}
+
+
+def import_state(state: dict) -> int:
+    """Merge saved stats; a model's stats are replaced only by more recently updated ones."""
+    if state.get("version") != STATS_VERSION:
+        return 0
+    loaded = 0
+    with _lock:
+        for model, data in state.get("models", {}).items():
+            if model not in MODEL_CONTEXT_TOKENS:
+                continue
+            current = _stats.get(model)
+            if current is None or (data.get("latency", {}).get("updated") or 0) > (current.latency.updated or 0):
+                _stats[model] = ModelStats.from_dict(data)
+                loaded += 1
+    return loaded
+
+
+def save(path: str = None):
+    path = path or MODEL_STATS_FILE
+    if not path:
+        return
+    state = export_state()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[DEBUG] Could not save model stats to {path}: {e}")
+
+
+def load(path: str = None):
+    path = path or MODEL_STATS_FILE
+    if not path or not os.path.exists(path):
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[DEBUG] Could not load model stats from {path}: {e}")
+        return
+    loaded = import_state(state)
+    print(f"[INFO] Loaded performance stats for {loaded} models")
@@ -0,0 +1,114 @@
+"""
+Executor policy for CPU-heavy post-processing.
+Work above a size threshold runs in a thread or process pool instead of the
+event loop; a semaphore bounds how much work can be queued at once.
+
+In process mode the worker process has its own metrics registry and no
+request context, so spans and metrics recorded inside func are lost there.
+The parent records the job as one span named after func, timed around the
+future (including pickling), in their place.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from . import metrics
+from . import tracing
+
+# inline: always run on the event loop, thread / process: offload payloads above the threshold
+OFFLOAD_MODE = os.getenv("OFFLOAD_MODE", "thread")
+# Payload size (characters) from which work is offloaded
+OFFLOAD_THRESHOLD = int(os.getenv("OFFLOAD_THRESHOLD", "20000"))
+OFFLOAD_MAX_WORKERS = int(os.getenv("OFFLOAD_MAX_WORKERS", "2"))
+# Jobs allowed in the pool at once; further callers wait (back-pressure)
+OFFLOAD_MAX_PENDING = int(os.getenv("OFFLOAD_MAX_PENDING", "8"))
+# Interval of the event loop lag probe, in seconds
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+
+_executor = None
+_semaphore = None
+_lag = {"samples": 0, "sum": 0.0, "max": 0.0}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if OFFLOAD_MODE == "process":
+            _executor = ProcessPoolExecutor(max_workers=OFFLOAD_MAX_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=OFFLOAD_MAX_WORKERS, thread_name_prefix="offload")
+    return _executor
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(OFFLOAD_MAX_PENDING)
+    return _semaphore
+
+
+async def run_cpu(stage: str, func, *args, size: int = 0):
+    """Run func(*args) inline for small payloads, in the configured pool otherwise."""
+    if OFFLOAD_MODE == "inline" or size < OFFLOAD_THRESHOLD:
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            metrics.observe("event_loop_blocked_seconds", time.perf_counter() - start, stage=stage)
+
+    queued = time.perf_counter()
+    async with _get_semaphore():
+        start = time.perf_counter()
+        metrics.observe("offload_queue_wait_seconds", start - queued, stage=stage)
+        try:
+            if OFFLOAD_MODE == "process":
+                with tracing.span(getattr(func, "__name__", stage), offloaded="process", input_chars=size):
+                    return await asyncio.get_running_loop().run_in_executor(_get_executor(), partial(func, *args))
+            # Threads keep the caller's context so tracing spans nest under the request
+            job = partial(contextvars.copy_context().run, func, *args)
+            return await asyncio.get_running_loop().run_in_executor(_get_executor(), job)
+        finally:
+            metrics.observe("offloaded_seconds", time.perf_counter() - start, stage=stage)
+
+
+async def monitor_loop_lag():
+    """Measure how late the event loop wakes up from a short sleep."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(time.perf_counter() - start - LOOP_LAG_INTERVAL, 0.0)
+        _lag["samples"] += 1
+        _lag["sum"] += lag
+        _lag["max"] = max(_lag["max"], lag)
+        metrics.observe("event_loop_lag_seconds", lag)
+
+
+def stats() -> dict:
+    """Offload policy, loop lag and per-stage blocked/offloaded timings."""
+    summaries = [
+        s for s in metrics.snapshot()["histograms"]
+        if s["name"] in ("event_loop_blocked_seconds", "offloaded_seconds", "offload_queue_wait_seconds")
+    ]
+    return {
+        "policy": {
+            "mode": OFFLOAD_MODE,
+            "threshold": OFFLOAD_THRESHOLD,
+            "max_workers": OFFLOAD_MAX_WORKERS,
+            "max_pending": OFFLOAD_MAX_PENDING,
+        },
+        "loop_lag": {
+            "samples": _lag["samples"],
+            "avg_seconds": _lag["sum"] / _lag["samples"] if _lag["samples"] else 0.0,
+            "max_seconds": _lag["max"],
+        },
+        "stages": summaries,
+    }
+
+
+def shutdown():
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,87 @@
+"""
+Prompt prefix reuse tracking.
+Each LLM call is described by its prompt layers, most stable first (persona,
+rules, catalog, then per-request content). A chained hash of every layer
+prefix is remembered in a bounded LRU per model; a prefix seen before is one a
+provider-side prefix/KV cache could have served. The share of prompt
+characters covered by such prefixes is the prefix reuse ratio. Layers are
+compared whole, so the ratio is a lower bound of byte-level reuse.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from . import metrics
+
+# Distinct prefixes remembered; older ones count as never seen
+PROMPT_PREFIX_WINDOW = int(os.getenv("PROMPT_PREFIX_WINDOW", "4096"))
+
+_seen = OrderedDict()
+_stats = {}
+_lock = threading.Lock()
+
+
+def observe(stage: str, model: str, layers: list):
+    """Record one call's (layer, text) pairs; returns the deepest layer whose prefix was seen before, or None."""
+    digest = hashlib.sha256(model.encode("utf-8"))
+    reused_layer = None
+    reused_chars = chars = 0
+    with _lock:
+        for name, text in layers:
+            digest.update(b"\x00" + text.encode("utf-8"))
+            chars += len(text)
+            key = digest.hexdigest()
+            if key in _seen:
+                _seen.move_to_end(key)
+                if chars - len(text) == reused_chars:
+                    reused_layer, reused_chars = name, chars
+            else:
+                _seen[key] = True
+        while len(_seen) > PROMPT_PREFIX_WINDOW:
+            _seen.popitem(last=False)
+
+        stats = _stats.setdefault(stage, {"calls": 0, "prompt_chars": 0, "reused_chars": 0, "hits": {}})
+        stats["calls"] += 1
+        stats["prompt_chars"] += chars
+        stats["reused_chars"] += reused_chars
+        if reused_layer:
+            stats["hits"][reused_layer] = stats["hits"].get(reused_layer, 0) + 1
+
+    metrics.inc("prompt_prefix_lookups_total", stage=stage)
+    metrics.inc("prompt_chars_total", chars, stage=stage)
+    if reused_layer:
+        metrics.inc("prompt_prefix_hits_total", stage=stage, layer=reused_layer)
+        metrics.inc("prompt_prefix_reused_chars_total", reused_chars, stage=stage)
+    return reused_layer
+
+
+def export_state() -> list:
+    """Remembered prefix hashes, least recently seen first."""
+    with _lock:
+        return list(_seen)
+
+
+def import_state(keys: list) -> int:
+    with _lock:
+        for key in keys:
+            _seen.setdefault(key, True)
+        while len(_seen) > PROMPT_PREFIX_WINDOW:
+            _seen.popitem(last=False)
+        return len(_seen)
+
+
+def snapshot() -> dict:
+    """Reuse ratio and deepest shared layer counts per stage."""
+    with _lock:
+        stages = {}
+        for stage, stats in _stats.items():
+            hits = sum(stats["hits"].values())
+            stages[stage] = {
+                **stats,
+                "hits": dict(stats["hits"]),
+                "hit_rate": round(hits / stats["calls"], 3),
+                "reuse_ratio": round(stats["reused_chars"] / stats["prompt_chars"], 3) if stats["prompt_chars"] else None,
+            }
+        return {"tracked_prefixes": len(_seen), "window": PROMPT_PREFIX_WINDOW, "stages": stages}
@@ -0,0 +1,315 @@
+"""
+Per-client rate limiting.
+A token bucket per client (a known X-Client-Key, otherwise the client IP)
+refills at RATE_LIMIT_REFILL tokens per second up to RATE_LIMIT_CAPACITY.
+A /chat request costs more the more work it causes: its model tier, an MCP
+server round trip, and every RATE_LIMIT_HISTORY_CHARS of history sent along.
+Bodies larger than RATE_LIMIT_MAX_BODY_BYTES are not buffered to price them
+and cost a full bucket.
+Other limited paths cost one token.
+
+Buckets live in memory per worker. With RATE_LIMIT_BACKEND=cache they are kept
+in the cache backend instead, shared by all workers using it: atomically on
+Redis, read-modify-write on SQLite (a few extra requests can slip through
+when workers race). If the backend fails, the worker's own buckets are used.
+
+Limited responses carry RateLimit-Limit / -Remaining / -Reset / -Policy
+headers; rejected requests get 429 with Retry-After.
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.datastructures import Headers
+
+from . import cache
+from . import codec
+from . import metrics
+from .codec import CodecJSONResponse
+from .hedging import MODEL_GROUPS
+
+# Bucket size in tokens; 0 disables rate limiting
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "40"))
+# Tokens added back per second
+RATE_LIMIT_REFILL = float(os.getenv("RATE_LIMIT_REFILL", "0.5"))
+# Paths that are rate limited
+RATE_LIMIT_PATHS = {p.strip() for p in os.getenv("RATE_LIMIT_PATHS", "/chat,/mcp-tools").split(",") if p.strip()}
+# memory (per worker) or cache (the CACHE_BACKEND, shared between workers)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+# Client keys accepted in X-Client-Key; requests without a known key are limited per IP
+RATE_LIMIT_CLIENT_KEYS = {k.strip() for k in os.getenv("RATE_LIMIT_CLIENT_KEYS", "").split(",") if k.strip()}
+# Reverse proxies in front of the app; the client IP is taken from X-Forwarded-For that many hops back
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+# /chat cost per model tier (MODEL_GROUPS name); models outside the groups cost the default tier
+RATE_LIMIT_TIER_COSTS = os.getenv("RATE_LIMIT_TIER_COSTS", "small_instruct=1,large_instruct=2,reasoning=4")
+RATE_LIMIT_DEFAULT_TIER = "large_instruct"
+# Extra cost of a /chat request with an MCP server
+RATE_LIMIT_MCP_COST = float(os.getenv("RATE_LIMIT_MCP_COST", "2"))
+# One extra token per this many characters of history
+RATE_LIMIT_HISTORY_CHARS = int(os.getenv("RATE_LIMIT_HISTORY_CHARS", "4000"))
+# Buckets kept in memory; the least recently used are dropped (and start full again)
+RATE_LIMIT_MAX_CLIENTS = 10000
+# /chat bodies are buffered up to this many bytes to price them; larger ones cost a full bucket
+RATE_LIMIT_MAX_BODY_BYTES = int(os.getenv("RATE_LIMIT_MAX_BODY_BYTES", str(1024 * 1024)))
+CLIENT_KEY_HEADER = "x-client-key"
+
+# Atomic token bucket on Redis: state is "tokens updated" in one key
+REDIS_BUCKET_SCRIPT = """
+local capacity, rate, cost, now, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local tokens, updated = capacity, now
+local state = redis.call('GET', KEYS[1])
+if state then
+  local sep = string.find(state, ' ')
+  tokens, updated = tonumber(string.sub(state, 1, sep - 1)), tonumber(string.sub(state, sep + 1))
+end
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('SET', KEYS[1], tostring(tokens) .. ' ' .. tostring(now), 'PX', ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+def _parse_tier_costs(spec: str) -> dict:
+    costs = {}
+    for pair in spec.split(","):
+        tier, _, cost = pair.partition("=")
+        tier = tier.strip()
+        if not tier:
+            continue
+        try:
+            costs[tier] = float(cost)
+        except ValueError:
+            print(f"[DEBUG] Ignoring invalid rate limit cost {cost!r} for tier {tier}")
+    return costs
+
+
+_tier_costs = _parse_tier_costs(RATE_LIMIT_TIER_COSTS)
+_tier_of = {model: tier for tier, models in MODEL_GROUPS.items() for model in models}
+
+
+def chat_cost(body) -> float:
+    """Tokens a /chat request costs, from its JSON body."""
+    if not isinstance(body, dict):
+        return 1.0
+    model = body.get("model")
+    # Not validated yet: a non-string model (e.g. a list) must not fail here, validation rejects it later
+    tier = _tier_of.get(model, RATE_LIMIT_DEFAULT_TIER) if isinstance(model, str) else RATE_LIMIT_DEFAULT_TIER
+    cost = _tier_costs.get(tier, _tier_costs.get(RATE_LIMIT_DEFAULT_TIER, 1.0))
+    if body.get("mcpServer"):
+        cost += RATE_LIMIT_MCP_COST
+    history = body.get("history")
+    if isinstance(history, list) and RATE_LIMIT_HISTORY_CHARS > 0:
+        chars = sum(len(str(m.get("content", ""))) for m in history if isinstance(m, dict))
+        cost += chars // RATE_LIMIT_HISTORY_CHARS
+    # A request costing more than the bucket holds could never pass
+    return min(cost, RATE_LIMIT_CAPACITY)
+
+
+def client_id(scope) -> str:
+    headers = Headers(scope=scope)
+    key = headers.get(CLIENT_KEY_HEADER)
+    if key and key in RATE_LIMIT_CLIENT_KEYS:
+        return "key:" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    ip = scope["client"][0] if scope.get("client") else "unknown"
+    if RATE_LIMIT_PROXY_HOPS > 0:
+        forwarded = [hop.strip() for hop in headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        # Entries left of the ones our own proxies appended are client supplied
+        if len(forwarded) >= RATE_LIMIT_PROXY_HOPS:
+            ip = forwarded[-RATE_LIMIT_PROXY_HOPS]
+    return "ip:" + ip
+
+
+def _refill(tokens: float, updated: float, now: float) -> float:
+    return min(RATE_LIMIT_CAPACITY, tokens + max(0.0, now - updated) * RATE_LIMIT_REFILL)
+
+
+class MemoryBuckets:
+    name = "memory"
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, client: str, cost: float, now: float):
+        """Spend cost tokens if available; returns (allowed, tokens left)."""
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (RATE_LIMIT_CAPACITY, now))
+            tokens = _refill(tokens, updated, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > RATE_LIMIT_MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+            return allowed, tokens
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class CacheBuckets:
+    """Buckets stored in the cache backend, shared by the workers using it."""
+    name = "cache"
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = asyncio.Lock()
+
+    def _key(self, client: str) -> str:
+        return cache.make_key("rate_limit", client)
+
+    def _ttl(self) -> float:
+        # An untouched bucket is full again after this long, so it can be forgotten
+        return RATE_LIMIT_CAPACITY / RATE_LIMIT_REFILL + 1 if RATE_LIMIT_REFILL > 0 else 24 * 3600
+
+    async def take(self, client: str, cost: float, now: float):
+        key = self._key(client)
+        if isinstance(self.backend, cache.RedisCache):
+            allowed, tokens = await self.backend.eval(
+                REDIS_BUCKET_SCRIPT, [key],
+                [RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL, cost, now, int(self._ttl() * 1000)],
+            )
+            return allowed == 1, float(tokens)
+        async with self._lock:
+            raw = await self.backend.get(key)
+            tokens, updated = codec.loads(raw) if raw else (RATE_LIMIT_CAPACITY, now)
+            tokens = _refill(tokens, updated, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            await self.backend.set(key, codec.dumps([tokens, now]), self._ttl())
+            return allowed, tokens
+
+
+_memory = MemoryBuckets()
+_shared = None
+
+
+def _store():
+    global _shared
+    if RATE_LIMIT_BACKEND != "cache":
+        return _memory
+    if _shared is None:
+        backend = cache.get_cache()
+        if backend is None or isinstance(backend, cache.MemoryCache):
+            # Nothing to share with: per-worker buckets do the same job without the serialization
+            return _memory
+        _shared = CacheBuckets(backend)
+    return _shared
+
+
+async def take(client: str, cost: float):
+    """Spend cost tokens of the client's bucket; falls back to the worker's buckets if the shared store fails."""
+    now = time.time()
+    store = _store()
+    try:
+        return await store.take(client, cost, now)
+    except Exception as e:
+        if store is _memory:
+            raise
+        print(f"[DEBUG] Rate limit store failed ({store.name}): {e}")
+        metrics.inc("rate_limit_store_errors_total", backend=store.name)
+        return await _memory.take(client, cost, now)
+
+
+def limit_headers(tokens: float, cost: float = 0.0, allowed: bool = True) -> dict:
+    window = RATE_LIMIT_CAPACITY / RATE_LIMIT_REFILL if RATE_LIMIT_REFILL > 0 else 0
+    full_in = (RATE_LIMIT_CAPACITY - tokens) / RATE_LIMIT_REFILL if RATE_LIMIT_REFILL > 0 else 0
+    headers = {
+        "RateLimit-Limit": str(int(RATE_LIMIT_CAPACITY)),
+        "RateLimit-Remaining": str(max(int(tokens), 0)),
+        "RateLimit-Reset": str(math.ceil(full_in)),
+        "RateLimit-Policy": f"{int(RATE_LIMIT_CAPACITY)};w={math.ceil(window)}",
+    }
+    if not allowed:
+        retry_after = (cost - tokens) / RATE_LIMIT_REFILL if RATE_LIMIT_REFILL > 0 else window
+        headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    return headers
+
+
+async def _read_body(receive, limit: int):
+    """Messages of the request body, and whether they are all of it (reading stops past limit bytes)."""
+    messages = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request" or not message.get("more_body", False):
+            return messages, True
+        size += len(message.get("body", b""))
+        if size > limit:
+            return messages, False
+
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or RATE_LIMIT_CAPACITY <= 0 or scope["method"] == "OPTIONS"
+                or scope["path"] not in RATE_LIMIT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        cost = 1.0
+        if scope["path"] == "/chat":
+            # The cost depends on the body, so read it here and replay it to the app
+            messages, complete = await _read_body(receive, RATE_LIMIT_MAX_BODY_BYTES)
+            if complete:
+                body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.request")
+                try:
+                    cost = chat_cost(codec.loads(body))
+                except ValueError:
+                    pass
+            else:
+                # Too large to price without buffering it all: charge the most a request can cost;
+                # the rest of the body streams to the app unread
+                cost = RATE_LIMIT_CAPACITY
+            pending = list(messages)
+
+            async def replay():
+                if pending:
+                    return pending.pop(0)
+                return await receive()
+        else:
+            replay = receive
+
+        client = client_id(scope)
+        allowed, tokens = await take(client, cost)
+        headers = limit_headers(tokens, cost, allowed)
+        metrics.inc("rate_limit_requests_total", path=scope["path"], outcome="allowed" if allowed else "limited")
+        metrics.inc("rate_limit_cost_total", cost, path=scope["path"])
+        if not allowed:
+            print(f"[STATUS] rate limited {client} on {scope['path']} (cost {cost:g}, {tokens:.1f} tokens left)")
+            response = CodecJSONResponse({"detail": "Rate limit exceeded", "retry_after": int(headers["Retry-After"])},
+                                         status_code=429, headers=headers)
+            await response(scope, replay, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", []))
+                           + [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]}
+            await send(message)
+
+        await self.app(scope, replay, send_with_headers)
+
+
+def snapshot() -> dict:
+    return {
+        "capacity": RATE_LIMIT_CAPACITY,
+        "refill_per_second": RATE_LIMIT_REFILL,
+        "backend": _store().name if RATE_LIMIT_CAPACITY > 0 else "off",
+        "paths": sorted(RATE_LIMIT_PATHS),
+        "tier_costs": _tier_costs,
+        "tracked_clients": len(_memory),
+    }
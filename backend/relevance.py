@@ -0,0 +1,197 @@
+"""
+Relevance ranking for tool results.
+Splits a tool result into chunks, scores each chunk against the user's message
+with BM25 and keeps the best chunks that fit into a token budget.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+
+from . import codec
+
+# Rough size of the tool result passed to the final LLM call, in tokens
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "2500"))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_HEADING_RE = re.compile(r'^(?=#{1,6} )', re.MULTILINE)
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_RESULT_BLOCK_RE = re.compile(r'<result>.*?<\/result>', re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens, single characters are dropped."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1]
+
+
+def bm25_scores(query: str, chunks: list) -> list:
+    """Score every chunk against the query with Okapi BM25."""
+    query_terms = set(tokenize(query))
+    if not query_terms or not chunks:
+        return [0.0] * len(chunks)
+
+    docs = [Counter(tokenize(chunk)) for chunk in chunks]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_len = (sum(lengths) / len(lengths)) or 1.0
+    n = len(docs)
+
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for doc in docs if term in doc)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+                score += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def _split_oversized(chunk: str, max_chars: int) -> list:
+    """Split a chunk by paragraphs, cutting paragraphs that are still too long at a line break or space."""
+    if len(chunk) <= max_chars:
+        return [chunk]
+    pieces = []
+    for paragraph in _PARAGRAPH_RE.split(chunk):
+        paragraph = paragraph.strip()
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind('\n', max_chars // 2, max_chars)
+            if cut <= 0:
+                cut = paragraph.rfind(' ', max_chars // 2, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        if paragraph:
+            pieces.append(paragraph)
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int) -> list:
+    """Split a document into <result> blocks or markdown sections."""
+    blocks = _RESULT_BLOCK_RE.findall(text)
+    if not blocks:
+        blocks = [section.strip() for section in _HEADING_RE.split(text) if section.strip()]
+    chunks = []
+    for block in blocks:
+        chunks.extend(_split_oversized(block, max_chars))
+    return chunks
+
+
+def _select(chunks: list, query: str, budget_chars: int) -> list:
+    """Return the indices of the best chunks that fit into the budget, in document order."""
+    scores = bm25_scores(query, chunks)
+    # On equal relevance earlier chunks win
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    kept = []
+    used = 0
+    for i in ranked:
+        size = len(chunks[i]) + 2
+        if used + size > budget_chars:
+            if scores[i] > 0:
+                continue
+            # Irrelevant chunks only fill the budget as a contiguous head of the document
+            break
+        kept.append(i)
+        used += size
+    return sorted(kept)
+
+
+def _compress_json(data, query: str, budget_chars: int):
+    """Rank the items of a JSON list (or the largest list inside an object).
+
+    Returns None when not a single item fits into the budget.
+    """
+    list_key = None
+    if isinstance(data, dict):
+        lists = [(k, v) for k, v in data.items() if isinstance(v, list) and v]
+        if lists:
+            list_key, items = max(lists, key=lambda kv: len(kv[1]))
+        else:
+            items = [{k: v} for k, v in data.items()]
+    else:
+        items = data
+
+    rendered = [codec.for_llm(item) for item in items]
+    overhead = len(codec.for_llm({k: v for k, v in data.items() if k != list_key})) if list_key else 0
+    kept = _select(rendered, query, max(budget_chars - overhead, 0))
+    if not kept:
+        return None
+    omitted = len(items) - len(kept)
+
+    if list_key is not None:
+        container = dict(data)
+        container[list_key] = [items[i] for i in kept]
+    elif isinstance(data, dict):
+        container = {}
+        for i in kept:
+            container.update(items[i])
+    else:
+        container = [items[i] for i in kept]
+
+    result = codec.for_llm(container)
+    if omitted:
+        result += f"\n... ({omitted} of {len(items)} items omitted as less relevant)"
+    return result
+
+
+def _truncate(text: str, budget_chars: int) -> str:
+    """Cut text to the budget at the last line break (else space) in its second half, never mid-line if avoidable."""
+    head = text[:budget_chars]
+    cut = head.rfind('\n', budget_chars // 2)
+    if cut < 0:
+        cut = head.rfind(' ', budget_chars // 2)
+    if cut > 0:
+        head = head[:cut]
+    return head.rstrip() + "\n... (truncated)"
+
+
+def compress_tool_result(readable_result: str, query: str, max_tokens: int = None) -> str:
+    """Keep the parts of a tool result most relevant to the query within a token budget."""
+    if not isinstance(readable_result, str) or not readable_result:
+        return readable_result
+    max_tokens = max_tokens or TOOL_RESULT_TOKEN_BUDGET
+    if estimate_tokens(readable_result) <= max_tokens:
+        return readable_result
+    budget_chars = max_tokens * 4
+
+    try:
+        data = codec.loads(readable_result)
+    except (ValueError, TypeError):
+        data = None
+    if isinstance(data, (list, dict)) and data:
+        compressed = _compress_json(data, query, budget_chars)
+        if compressed is not None:
+            return compressed
+        # Not a single item fits: cut the indented form, one value per line, so no value is split
+        return _truncate(codec.dumps(data, pretty=True), budget_chars)
+
+    chunks = chunk_text(readable_result, budget_chars // 2)
+    kept = _select(chunks, query, budget_chars)
+    if not kept:
+        return _truncate(readable_result, budget_chars)
+
+    parts = []
+    previous = -1
+    for i in kept:
+        if i != previous + 1:
+            parts.append("[...]")
+        parts.append(chunks[i])
+        previous = i
+    if previous != len(chunks) - 1:
+        parts.append(f"... ({len(chunks) - len(kept)} of {len(chunks)} sections omitted as less relevant)")
+    return "\n\n".join(parts)
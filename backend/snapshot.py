@@ -0,0 +1,140 @@
+"""
+Warm-start snapshot.
+Periodically saves the state a restarted worker would otherwise have to
+relearn to a SQLite file, and loads it at startup before traffic is accepted:
+  cache            tool catalogs and tool results of the in-memory cache
+  timeouts         learned MCP latencies (adaptive_timeouts)
+  model_stats      LLM latency and error stats
+  prompt_prefixes  prompt prefix hashes behind the reuse ratio
+Each section carries its own version, and loading respects TTLs: expired
+cache entries and sections older than WARM_SNAPSHOT_MAX_AGE are skipped.
+Learned state is merged per key, keeping whichever side was updated later.
+Workers on one host share the file; the last writer wins.
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+
+from . import adaptive_timeouts
+from . import cache
+from . import codec
+from . import model_stats
+from . import prompt_prefix
+
+# Snapshot file; empty disables snapshots
+WARM_SNAPSHOT_FILE = os.getenv("WARM_SNAPSHOT_FILE", "warm-snapshot.sqlite3")
+# Seconds between snapshots
+WARM_SNAPSHOT_INTERVAL = float(os.getenv("WARM_SNAPSHOT_INTERVAL", "60"))
+# Learned state older than this (seconds) is not restored
+WARM_SNAPSHOT_MAX_AGE = float(os.getenv("WARM_SNAPSHOT_MAX_AGE", str(7 * 24 * 3600)))
+SCHEMA_VERSION = 1
+
+# name -> (version, export, import)
+SECTIONS = {
+    "timeouts": (adaptive_timeouts.STATE_VERSION, adaptive_timeouts.export_state, adaptive_timeouts.import_state),
+    "model_stats": (model_stats.STATS_VERSION, model_stats.export_state, model_stats.import_state),
+    "prompt_prefixes": (1, prompt_prefix.export_state, prompt_prefix.import_state),
+}
+
+last_snapshot = {"saved": None, "seconds": None, "loaded": None, "error": None}
+
+
+def _connect(path: str):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != SCHEMA_VERSION:
+        # Unknown layout: start over rather than misread it
+        conn.execute("DROP TABLE IF EXISTS sections")
+        conn.execute("DROP TABLE IF EXISTS cache_entries")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.execute("CREATE TABLE IF NOT EXISTS sections (name TEXT PRIMARY KEY, version INTEGER NOT NULL, saved REAL NOT NULL, data TEXT NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+    return conn
+
+
+def _memory_cache():
+    backend = cache.get_cache()
+    # SQLite and Redis caches outlive the process already
+    return backend if isinstance(backend, cache.MemoryCache) else None
+
+
+def collect() -> dict:
+    """Current state to save; runs on the event loop so the in-memory cache is read consistently."""
+    memory = _memory_cache()
+    return {
+        "sections": {name: (version, codec.dumps(export())) for name, (version, export, _) in SECTIONS.items()},
+        "cache_entries": memory.entries() if memory else [],
+    }
+
+
+def write(state: dict, path: str = None):
+    path = path or WARM_SNAPSHOT_FILE
+    now = time.time()
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN")
+        for name, (version, data) in state["sections"].items():
+            conn.execute("INSERT OR REPLACE INTO sections (name, version, saved, data) VALUES (?, ?, ?, ?)",
+                         (name, version, now, data))
+        conn.executemany("INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)",
+                         state["cache_entries"])
+        conn.execute("DELETE FROM cache_entries WHERE expires < ?", (now,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def load(path: str = None) -> dict:
+    """Restore the snapshot into the running modules; returns what was restored per section."""
+    path = path or WARM_SNAPSHOT_FILE
+    if not path or not os.path.exists(path):
+        return {}
+    start = time.perf_counter()
+    restored = {}
+    try:
+        conn = _connect(path)
+        try:
+            now = time.time()
+            for name, version, saved, data in conn.execute("SELECT name, version, saved, data FROM sections"):
+                section = SECTIONS.get(name)
+                if section is None or section[0] != version or now - saved > WARM_SNAPSHOT_MAX_AGE:
+                    continue
+                restored[name] = section[2](codec.loads(data))
+            memory = _memory_cache()
+            if memory is not None:
+                rows = conn.execute("SELECT key, value, expires FROM cache_entries WHERE expires >= ? ORDER BY expires",
+                                    (now,)).fetchall()
+                restored["cache"] = memory.restore(rows)
+        finally:
+            conn.close()
+    except (sqlite3.Error, ValueError) as e:
+        last_snapshot["error"] = f"{type(e).__name__}: {e}"
+        print(f"[DEBUG] Could not load warm-start snapshot from {path}: {e}")
+        return restored
+    last_snapshot["loaded"] = {"restored": restored, "seconds": time.perf_counter() - start}
+    print(f"[INFO] Warm-start snapshot restored {restored} in {time.perf_counter() - start:.3f}s")
+    return restored
+
+
+async def save():
+    if not WARM_SNAPSHOT_FILE:
+        return
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(write, collect())
+        last_snapshot.update(saved=time.time(), seconds=time.perf_counter() - start, error=None)
+    except (sqlite3.Error, OSError) as e:
+        last_snapshot["error"] = f"{type(e).__name__}: {e}"
+        print(f"[DEBUG] Could not save warm-start snapshot to {WARM_SNAPSHOT_FILE}: {e}")
+
+
+async def run_periodic():
+    """Save a snapshot every WARM_SNAPSHOT_INTERVAL seconds until cancelled."""
+    if not WARM_SNAPSHOT_FILE or WARM_SNAPSHOT_INTERVAL <= 0:
+        return
+    while True:
+        await asyncio.sleep(WARM_SNAPSHOT_INTERVAL)
+        await save()
@@ -0,0 +1,127 @@
+"""
+Startup profile.
+Times every module import while the backend starts (and while heavy SDKs are
+warmed up in the background) with a meta path hook, plus a few startup
+milestones. Served by /debug/startup.
+"""
+
+import os
+import sys
+import threading
+import time
+
+# Set to 0 to skip the import hook
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "1") == "1"
+TOP_MODULES = 30
+
+_imports = {}
+_milestones = {}
+_stack = threading.local()
+_lock = threading.Lock()
+_finder = None
+
+
+def _process_age():
+    """Seconds since the process started (Linux only)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def mark(name: str):
+    """Record a startup milestone, in seconds since the process started."""
+    age = _process_age()
+    _milestones[name] = {"at": time.time(), "since_process_start_s": age}
+
+
+class _TimedLoader:
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Hide the wrapper from the module so loader type checks keep working
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        stack = getattr(_stack, "names", None)
+        if stack is None:
+            stack = _stack.names = []
+        parent = stack[-1] if stack else None
+        stack.append(module.__name__)
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with _lock:
+                entry = _entry(module.__name__)
+                entry["cumulative_s"] += elapsed
+                entry["self_s"] += elapsed
+                if parent:
+                    _entry(parent)["self_s"] -= elapsed
+
+
+def _entry(name: str) -> dict:
+    return _imports.setdefault(name, {"cumulative_s": 0.0, "self_s": 0.0, "thread": threading.current_thread().name})
+
+
+class _TimingFinder:
+    """Delegates to the other finders and wraps the loader they return."""
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+def install():
+    """Start timing imports."""
+    global _finder
+    mark("profile_installed")
+    if STARTUP_PROFILE and _finder is None:
+        _finder = _TimingFinder()
+        sys.meta_path.insert(0, _finder)
+
+
+def uninstall():
+    """Stop timing imports (modules imported later are not recorded)."""
+    global _finder
+    if _finder is not None:
+        try:
+            sys.meta_path.remove(_finder)
+        except ValueError:
+            pass
+        _finder = None
+
+
+def report(top: int = TOP_MODULES) -> dict:
+    with _lock:
+        imports = {name: dict(entry) for name, entry in _imports.items()}
+    by_cumulative = sorted(imports.items(), key=lambda kv: -kv[1]["cumulative_s"])[:top]
+    by_self = sorted(imports.items(), key=lambda kv: -kv[1]["self_s"])[:top]
+    return {
+        "enabled": STARTUP_PROFILE,
+        "milestones": _milestones,
+        "modules_imported": len(imports),
+        "total_import_s": sum(max(entry["self_s"], 0) for entry in imports.values()),
+        "top_cumulative": [{"module": name, **entry} for name, entry in by_cumulative],
+        "top_self": [{"module": name, **entry} for name, entry in by_self],
+    }
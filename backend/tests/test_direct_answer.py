@@ -0,0 +1,71 @@
+"""Documentation answers rendered without the final LLM call must come from the uncompressed tool text."""
+
+import asyncio
+import contextlib
+import io
+import os
+
+from fastapi.testclient import TestClient
+from fastmcp import FastMCP
+
+os.environ.setdefault("TIMEOUT_STATE_FILE", "")
+os.environ.setdefault("MODEL_STATS_FILE", "")
+os.environ.setdefault("WARM_SNAPSHOT_FILE", "")
+os.environ.setdefault("RATE_LIMIT_CAPACITY", "0")
+os.environ.setdefault("CACHE_BACKEND", "off")
+
+from backend.loadtest.stub_agent import StubAgentConfig, install_stub_iointel  # noqa: E402
+
+install_stub_iointel(StubAgentConfig(latency=0, jitter=0, tool_call_ratio=1.0))
+
+from backend import main  # noqa: E402
+from backend.loadtest.driver import TRAITS  # noqa: E402
+from backend.loadtest.stub_mcp import DEEPWIKI_URL, stub_client_factory  # noqa: E402
+
+BLOCKS = 20
+
+
+def deepwiki_payload() -> str:
+    # Blocks above relevance's chunk size, which compression would split mid-block
+    paragraph = "The fastapi project explains dependency injection, routing and validation here. " * 80
+    return "".join(
+        f"<result><url>https://deepwiki.com/fastapi/fastapi/{i}</url><text># Section {i}\n{paragraph}</text></result>"
+        for i in range(BLOCKS)
+    )
+
+
+def build_server() -> FastMCP:
+    server = FastMCP("deepwiki-large")
+
+    @server.tool
+    async def ask_question(repoName: str, question: str) -> str:
+        """Ask any question about a GitHub repository."""
+        return deepwiki_payload()
+
+    return server
+
+
+def test_large_result_payload_renders_without_compression_markers():
+    main.Client = stub_client_factory({DEEPWIKI_URL: build_server()})
+    body = {"message": "How does dependency injection work in fastapi/fastapi?", "traits": TRAITS,
+            "mcpServer": DEEPWIKI_URL, "lang": "en"}
+    with TestClient(main.app) as client, contextlib.redirect_stdout(io.StringIO()):
+        r = client.post("/chat", json=body)
+    assert r.status_code == 200
+    answer = r.json()["response"]
+    assert answer.startswith(main.answer_policy.LEAD_INS["deepwiki"])
+    assert "[...]" not in answer
+    assert "omitted as less relevant" not in answer
+    assert "<result>" not in answer and "</text>" not in answer
+    # Every rendered section keeps its source link
+    sections = answer.count("# Section ")
+    assert sections >= 1
+    assert answer.count("https://deepwiki.com/fastapi/fastapi/") >= sections
+
+
+def test_direct_render_stays_within_output_budget():
+    readable = main.build_readable_result({"content": [{"type": "text", "text": deepwiki_payload()}]})
+    assert len(readable) > main.SFORMAT_OUTPUT_BUDGET
+    rendered = asyncio.run(asyncio.to_thread(main.process_response_for_markdown, readable))
+    assert len(rendered) <= main.SFORMAT_OUTPUT_BUDGET + 200
+    assert "[...]" not in rendered
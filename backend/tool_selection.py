@@ -0,0 +1,89 @@
+"""
+Relevance-based tool subset selection.
+Large MCP catalogs (CoinGecko exposes dozens of tools) are scored against the
+user's message with BM25 over structured tool descriptions, and only the top-k
+tools go into the tool selection prompt. Small catalogs, messages without any
+matching terms and low-confidence rankings fall back to the full list.
+"""
+
+import os
+import re
+
+from .relevance import bm25_scores
+
+# Tools injected into the prompt when the catalog is narrowed; 0 disables selection
+TOOL_SELECTION_TOP_K = int(os.getenv("TOOL_SELECTION_TOP_K", "8"))
+# Catalogs with at most this many tools are always sent whole
+TOOL_SELECTION_MIN_TOOLS = int(os.getenv("TOOL_SELECTION_MIN_TOOLS", "12"))
+# A ranking is trusted when the k-th tool scores below this share of the best one
+TOOL_SELECTION_MARGIN = float(os.getenv("TOOL_SELECTION_MARGIN", "0.9"))
+
+_CAMEL_RE = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+
+
+def describe_tool(tool) -> dict:
+    """Structured description of an MCP tool: name, description and parameters."""
+    params = getattr(tool, 'parameters', None)
+    if not params:
+        params = getattr(tool, 'input_schema', None) or getattr(tool, 'inputSchema', None)
+    params = params if isinstance(params, dict) else {}
+    properties = params.get('properties', {})
+    required = params.get('required', [])
+    # Required parameters first, in the order the server lists them
+    names = list(required) + [name for name in properties if name not in required]
+    return {
+        "name": getattr(tool, 'name', str(tool)),
+        "description": getattr(tool, 'description', '') or '',
+        "params": [
+            {
+                "name": name,
+                "type": properties.get(name, {}).get('type', 'unknown'),
+                "description": properties.get(name, {}).get('description', ''),
+                "required": name in required,
+            }
+            for name in names
+        ],
+    }
+
+
+def render_catalog(tools: list) -> str:
+    """Markdown catalog for the prompt: each tool with its required parameters."""
+    tool_descriptions = []
+    for tool in tools:
+        desc = f"- **{tool['name']}**: {tool['description']}"
+        param_lines = [
+            f"    - {param['name']} ({param['type']}): {param['description']}"
+            for param in tool['params'] if param['required']
+        ]
+        if param_lines:
+            desc += "\n  Required Params:\n" + "\n".join(param_lines)
+        tool_descriptions.append(desc)
+    return "\n".join(tool_descriptions)
+
+
+def tool_document(tool: dict) -> str:
+    """Text a tool is matched on: its name split into words, description and parameters."""
+    name_words = _CAMEL_RE.sub(' ', tool['name']).replace('_', ' ').replace('-', ' ')
+    parts = [name_words, name_words, tool['description']]
+    for param in tool['params']:
+        parts.append(_CAMEL_RE.sub(' ', param['name']).replace('_', ' '))
+        parts.append(param['description'])
+    return "\n".join(parts)
+
+
+def select_tools(query: str, tools: list, top_k: int = None):
+    """Top-k tools for the query in catalog order, and whether the full list was kept.
+
+    The catalog order is kept so the same subset always renders the same prompt.
+    """
+    top_k = TOOL_SELECTION_TOP_K if top_k is None else top_k
+    if top_k <= 0 or len(tools) <= max(top_k, TOOL_SELECTION_MIN_TOOLS):
+        return tools, True
+    scores = bm25_scores(query, [tool_document(tool) for tool in tools])
+    ranked = sorted(range(len(tools)), key=lambda i: (-scores[i], i))
+    best = scores[ranked[0]]
+    # Nothing matched, or the cut falls among near-equal scores: keep everything
+    if best <= 0 or scores[ranked[top_k]] >= best * TOOL_SELECTION_MARGIN:
+        return tools, True
+    kept = sorted(ranked[:top_k])
+    return [tools[i] for i in kept], False
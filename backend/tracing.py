@@ -0,0 +1,182 @@
+"""
+Lightweight request tracing.
+Nested spans are tracked with a context variable; finished traces are kept in a
+bounded in-memory ring buffer for /debug/traces and can optionally be appended
+to a file as OTLP/JSON (one ExportTraceServiceRequest per line).
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from . import codec
+from . import memory_profile
+
+# Number of finished traces kept in memory
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# Optional OTLP/JSON export file
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+SERVICE_NAME = "3d-ai-assistant-backend"
+
+_current_span = ContextVar("current_span", default=None)
+_traces = OrderedDict()
+_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name: str, trace: dict, parent=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+def current_trace_id():
+    current = _current_span.get()
+    return current.trace["trace_id"] if current else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Open a span; the outermost span of a request starts a new trace."""
+    parent = _current_span.get()
+    if parent is None:
+        trace = {"trace_id": uuid.uuid4().hex, "spans": []}
+    else:
+        trace = parent.trace
+    current = Span(name, trace, parent, attributes)
+    token = _current_span.set(current)
+    profile = memory_profile.active()
+    stage = profile.enter(name) if profile else None
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        if stage is not None:
+            usage = profile.exit(stage)
+            current.set(memory_peak_kb=usage["peak_kb"], memory_retained_kb=usage["retained_kb"])
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace["spans"].append(current)
+        if parent is None:
+            _finish(trace, current)
+
+
+def _finish(trace: dict, root: Span):
+    trace["root"] = root
+    with _lock:
+        _traces[trace["trace_id"]] = trace
+        while len(_traces) > TRACE_BUFFER_SIZE:
+            _traces.popitem(last=False)
+    if TRACE_EXPORT_FILE:
+        try:
+            export_otlp(trace, TRACE_EXPORT_FILE)
+        except Exception as e:
+            print(f"[DEBUG] Trace export failed: {e}")
+
+
+def _summary(trace: dict) -> dict:
+    root = trace["root"]
+    return {
+        "trace_id": trace["trace_id"],
+        "name": root.name,
+        "start": root.start_ns / 1e9,
+        "duration_ms": (root.end_ns - root.start_ns) / 1e6,
+        "spans": len(trace["spans"]),
+        "status": "error" if any(s.status == "error" for s in trace["spans"]) else "ok",
+        "attributes": root.attributes,
+    }
+
+
+def list_traces() -> list:
+    """Summaries of the buffered traces, newest first."""
+    with _lock:
+        traces = list(_traces.values())
+    return [_summary(trace) for trace in reversed(traces)]
+
+
+def get_trace(trace_id: str):
+    """Waterfall view of one trace: spans in start order with offsets relative to the root."""
+    with _lock:
+        trace = _traces.get(trace_id)
+    if trace is None:
+        return None
+    root = trace["root"]
+    spans = sorted(trace["spans"], key=lambda s: s.start_ns)
+    by_id = {s.span_id: s for s in spans}
+
+    def depth(s):
+        level = 0
+        while s.parent_id and s.parent_id in by_id:
+            s = by_id[s.parent_id]
+            level += 1
+        return level
+
+    return {
+        **_summary(trace),
+        "waterfall": [
+            {
+                "name": s.name,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "depth": depth(s),
+                "offset_ms": (s.start_ns - root.start_ns) / 1e6,
+                "duration_ms": (s.end_ns - s.start_ns) / 1e6,
+                "status": s.status,
+                "attributes": s.attributes,
+            }
+            for s in spans
+        ],
+    }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def export_otlp(trace: dict, path: str):
+    """Append a trace to path as one OTLP/JSON line."""
+    spans = [
+        {
+            "traceId": trace["trace_id"],
+            "spanId": s.span_id,
+            "parentSpanId": s.parent_id or "",
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2 if s.status == "error" else 1},
+        }
+        for s in trace["spans"]
+    ]
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "backend.tracing"}, "spans": spans}],
+        }]
+    }
+    line = codec.dumps(payload)
+    with _lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
@@ -34,6 +34,8 @@ export interface Message {
   content: string
   role: 'user' | 'assistant'
   timestamp: Date
+  // Message re-typed in the right keyboard layout, offered as a "did you mean" chip
+  layoutSuggestion?: string
 }
 
 export interface AIConfig {